@@ -1,10 +1,13 @@
 import pygame
-from Utilities import GRAVITY, WIDTH, PPM, tiles_group, enemies_group
+from Utilities import GRAVITY, PPM, tiles_group, enemies_group, camera, rect_collideany
 
 
 class BaseCharacter(pygame.sprite.Sprite):
     """Базовый класс для одушевленных объектов. Отвечает за гравитацию и ограничение вертикальной
     скорости; подготавливает, обновляет и проверяет коллизии"""
+    # Коллизия -> (нормаль поверхности тайла, которого она касается, край объекта, край тайла)
+    SIDES = {'left': ((1, 0), 'x', 'right'), 'right': ((-1, 0), 'right', 'x'),
+             'down': ((0, -1), 'bottom', 'y'), 'top': ((0, 1), 'y', 'bottom')}
 
     def __init__(self, x, y, *groups):
         """init следует вызывать только после присваивания self.image в дочернем классе.
@@ -17,32 +20,90 @@ class BaseCharacter(pygame.sprite.Sprite):
         self.create_sides()  # Создание коллизий
         self.gravity = GRAVITY  # Ускорение свободного падения
         self.on_screen = False  # Объект начинает двигаться, только после появления на экране
+        self.last_pos = self.rect.topleft  # Положение, от которого отсчитывается перемещение
 
     def update_coords(self):
+        # Отсюда начинается перемещение, которое проверит sweep_tiles
+        self.last_pos = self.rect.topleft
         if self.on_screen:  # Координаты изменяются, только если объект хоть раз появился на экране
             self.vy += self.gravity
             self.vy = max(min(self.vy, self.max_vy), -self.max_vy)  # Ограничение макс. скорости
             self.rect = self.rect.move(self.vx, self.vy)
-        elif 0 <= self.rect.x <= WIDTH:  # если камера перемещает координату x на экран, то начинаем
+        elif camera.in_view(self.rect):  # если координата x попала на экран, то начинаем
             #  двигаться. На y проверка не нужна, т.к. если объект выпадет, то будет удален камерой,
             #  а если будет слишком высоко, то либо рано или поздно вернется, или будет удален
             self.on_screen = True  # камерой при выходе за левую границу
 
     def check_tile_collisions(self):
         """Метод проверяет столкновение NPC с тайлами"""
-        self.check_any_collisions(tiles_group)
+        for normal, tile in self.sweep_tiles():
+            self.hit_tile(normal, tile)
+
+    def hit_tile(self, normal, tile):
+        """Реакция NPC на касание тайла. normal - нормаль поверхности тайла, направленная к NPC"""
+        nx, ny = normal
+        if nx:
+            # NPC всегда движутся с постоянной скоростью, при ударе о стену достаточно поменять
+            # только направление движения
+            self.vx = -self.vx
+        elif ny < 0:
+            self.vy = min(0, self.vy)  # Если NPC приземлился, то больше не может двигаться вниз
+        else:
+            self.vy = max(0, self.vy)  # Ударившись головой, NPC может лететь только вниз
+
+    def sweep_tiles(self):
+        """Перемещение с начала кадра (update_coords) с учетом тайлов: сначала по горизонтали,
+        потом по вертикали. Ведущая по направлению движения коллизия проверяется на всем пути,
+        который она прошла за кадр, поэтому объект не пролетает сквозь тайлы на любой скорости
+        и останавливается у ближайшего тайла на этом пути. Возвращает касания в виде списка пар
+        (нормаль, тайл): (1, 0) - стена слева, (-1, 0) - справа, (0, -1) - пол, (0, 1) - потолок"""
+        dx, dy = self.rect.x - self.last_pos[0], self.rect.y - self.last_pos[1]
+        self.rect.topleft = self.last_pos
+        contacts = []
+        # Ведущая коллизия проверяется первой, иначе отстающая найдет тайл, сквозь который
+        # объект только что прошел
+        self.rect.x += dx
+        self.update_sides()
+        for side in (['left', 'right'] if dx < 0 else ['right', 'left']):
+            self.resolve_side(side, dx, 0, contacts)
+        self.rect.y += dy
+        self.update_sides()
+        for side in (['top', 'down'] if dy < 0 else ['down', 'top']):
+            self.resolve_side(side, 0, dy, contacts)
+        self.last_pos = self.rect.topleft
+        return contacts
+
+    def resolve_side(self, side, dx, dy, contacts):
+        """Выталкивает объект из ближайшего тайла, которого касается коллизия side, и добавляет
+        касание в contacts. Если объект сдвинулся на (dx, dy) в сторону этой коллизии,
+        то проверяется вся область, которую она заметает"""
+        probe = getattr(self, side + '_side')
+        if probe is None:
+            return
+        normal, own_edge, tile_edge = BaseCharacter.SIDES[side]
+        if normal[0] * dx + normal[1] * dy < 0:
+            probe = probe.union(probe.move(-dx, -dy))
+        sign = -(normal[0] + normal[1])  # Ближайший тайл - с наименьшим sign * край тайла
+        tile = tiles_group.nearest(probe, lambda tile: sign * tile.edge(tile_edge, probe))
+        if tile:
+            setattr(self.rect, own_edge, tile.edge(tile_edge, probe))
+            contacts.append((normal, tile))
+            self.update_sides()
 
     def check_enemies_collisions(self):
         """Метод проверяет столкновение NPC с врагами"""
-        self.check_any_collisions(enemies_group)
-
-    def check_any_collisions(self, group):
-        """Метод, отвечающий за взаимодействие левой, правой и нижней коллизий NPC с группами
-        спрайтов. Многим наследникам не нужна верхняя коллизия. Объекты, которым она все же нужна,
+        candidates = enemies_group.candidates(self)  # Враги, найденные широкой фазой
+        self.check_any_collisions(lambda side: rect_collideany(side, candidates))
+
+    def check_any_collisions(self, collideany):
+        """Метод, отвечающий за взаимодействие левой, правой и нижней коллизий NPC с подвижными
+        объектами. collideany - функция, возвращающая спрайт группы, с которым пересекается
+        прямоугольник коллизии.
+        Многим наследникам не нужна верхняя коллизия. Объекты, которым она все же нужна,
         могут переопределить или расширить этот метод"""
         self.update_sides()  # Обновляем коллизии, т.к. с момента прошлого вызова метода положение
         # объекта, скорее всего, поменялось.
-        colided_tile = pygame.sprite.spritecollideany(self.left_side, group)
+        colided_tile = collideany(self.left_side)
         if colided_tile:
             # т.к. проверки на столконвения происходят ограниченное кол-во раз в секунду, то между
             # ними объект может слегка вылететь за текстуры, строка ниже возвращает его назад
@@ -51,47 +112,37 @@ class BaseCharacter(pygame.sprite.Sprite):
             # с постоянной скоростью, достаточно поменять только направление движения
             self.update_sides()  # Обновляем коллизии после изменения положения объекта
 
-        colided_tile = pygame.sprite.spritecollideany(self.right_side, group)
+        colided_tile = collideany(self.right_side)
         if colided_tile:
             # Это не копипаст, новые координаты присваиваются для разных сторон по-разному
             self.rect.right = colided_tile.rect.x
             self.vx = -self.vx
             self.update_sides()
 
-        colided_tile = pygame.sprite.spritecollideany(self.down_side, group)
+        colided_tile = collideany(self.down_side)
         if colided_tile:
             self.rect.bottom = colided_tile.rect.y
             self.vy = min(0, self.vy)  # Если NPC приземлился, то больше не может двигаться вниз
             self.update_sides()
 
     def create_top_side(self):
-        # Наследники класса, которым не нужна верхняя коллизия, дожны заменить этот метод на pass
-        self.top_side = pygame.sprite.Sprite(self.sides_group)
-        self.top_side.image = pygame.Surface((self.rect.w, 1))
-        self.top_side.image.fill((0, 255, 0))
+        """Возвращает прямоугольник верхней коллизии. Наследники класса, которым не нужна
+        верхняя коллизия, дожны заменить этот метод на pass, тогда top_side будет None"""
+        return pygame.Rect(0, 0, 0, 0)
 
     def update_top_side(self):
         # Наследники класса, которым не нужна верхняя коллизия, дожны заменить этот метод на pass
-        self.top_side.rect = pygame.Rect(self.rect.x, self.rect.y - 1,
-                                         self.rect.w, 1)
+        self.top_side.update(self.rect.x, self.rect.y - 1, self.rect.w, 1)
 
     def create_sides(self):
-        self.sides_group = pygame.sprite.Group()  # Группа нужна для удобства отрисовки
-
-        self.create_top_side()
-        self.down_side = pygame.sprite.Sprite(self.sides_group)
-        self.left_side = pygame.sprite.Sprite(self.sides_group)
-        self.right_side = pygame.sprite.Sprite(self.sides_group)
+        """Коллизии - прямоугольники, которые создаются один раз и дальше только сдвигаются
+        в update_sides. Отдельных спрайтов и поверхностей для них не нужно"""
+        self.top_side = self.create_top_side()
+        self.down_side = pygame.Rect(0, 0, 0, 0)
+        self.left_side = pygame.Rect(0, 0, 0, 0)
+        self.right_side = pygame.Rect(0, 0, 0, 0)
         self.update_sides()
 
-        # Визуализация коллизий для дебага
-        self.down_side.image = pygame.Surface((self.rect.w - self.rect.w // 3, 1))
-        self.down_side.image.fill((0, 255, 0))
-        self.left_side.image = pygame.Surface((1, self.rect.h - self.max_vy * 2))
-        self.left_side.image.fill((0, 255, 0))
-        self.right_side.image = pygame.Surface((1, self.rect.h - self.max_vy * 2))
-        self.right_side.image.fill((0, 255, 0))
-
     def update_sides(self):
         """Левая и правая коллизия должны отступать от верхней и нижней на максимальное расстояние,
         которое может пролететь объект за один кадр, иначе возможны ложные срабатывания,
@@ -100,10 +151,15 @@ class BaseCharacter(pygame.sprite.Sprite):
         присвоены корректные координаты по x. (Всё дело в порядке проверки коллизий)"""
         self.update_top_side()
         # Нижняя коллизия не может быть слишком широкой, иначе объект не сможет упасть
-        self.down_side.rect = pygame.Rect(self.rect.x + self.rect.w // 6, self.rect.bottom,
-                                          self.rect.w - self.rect.w // 3, 1)
-
-        self.left_side.rect = pygame.Rect(self.rect.x - 1, self.rect.y + self.max_vy, 1,
-                                          self.rect.h - self.max_vy * 2)
-        self.right_side.rect = pygame.Rect(self.rect.right, self.rect.y + self.max_vy, 1,
-                                           self.rect.h - self.max_vy * 2)
+        self.down_side.update(self.rect.x + self.rect.w // 6, self.rect.bottom,
+                              self.rect.w - self.rect.w // 3, 1)
+
+        self.left_side.update(self.rect.x - 1, self.rect.y + self.max_vy, 1,
+                              self.rect.h - self.max_vy * 2)
+        self.right_side.update(self.rect.right, self.rect.y + self.max_vy, 1,
+                               self.rect.h - self.max_vy * 2)
+
+    def get_sides(self):
+        """Все существующие коллизии объекта"""
+        return [side for side in (self.top_side, self.down_side, self.left_side, self.right_side)
+                if side is not None]
@@ -0,0 +1,108 @@
+import atexit
+import random
+import struct
+import pygame
+
+# Клавиши, которые использует игра. Номер клавиши в списке - номер бита в масках InputFrame
+KEYS = [pygame.K_UP, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_LSHIFT, pygame.K_x]
+QUIT_BIT = len(KEYS)  # Бит маски нажатий, означающий закрытие окна
+DEBUG_KEY = pygame.K_F1  # Переключение отладочной отрисовки. Не записывается: на игру не влияет
+
+MAGIC = b'MRVI'
+VERSION = 1
+HEADER = '<4sHQI'  # Сигнатура, версия, зерно генератора случайных чисел, количество кадров
+MAX_SEED = 2 ** 64 - 1  # Зерно пишется в заголовок как беззнаковое 64-битное число
+FRAME = '<BB'  # Кадр записи: маска удерживаемых клавиш и маска нажатых в этом кадре
+
+
+class InputFrame:
+    """Снимок ввода за один кадр: клавиши, нажатые в этом кадре, удерживаемые клавиши,
+    запрос на выход и запрос на переключение отладочной отрисовки"""
+
+    def __init__(self, held=0, pressed=0, toggle_debug=False):
+        self.held_mask = held
+        self.pressed_mask = pressed
+        self.quit = bool(pressed >> QUIT_BIT & 1)
+        self.toggle_debug = toggle_debug
+
+    def held(self, key):
+        """Удерживается ли клавиша key"""
+        return bool(self.held_mask >> KEYS.index(key) & 1)
+
+    def keydown(self, key):
+        """Была ли клавиша key нажата в этом кадре"""
+        return bool(self.pressed_mask >> KEYS.index(key) & 1)
+
+
+class Controls:
+    """Источник ввода для игрока. Читает клавиатуру, может записывать ввод каждого кадра в
+    компактный файл и воспроизводить его. Вместе с зерном генератора rng запись однозначно
+    определяет ход игры, поэтому ее можно использовать как повторяемый тест производительности"""
+
+    def __init__(self):
+        self.seed = random.getrandbits(32)  # Зерно для Utilities.rng
+        self.frames = []  # Записанные или воспроизводимые кадры в виде пар масок
+        self.cursor = 0  # Номер следующего воспроизводимого кадра
+        self.recording = None  # Путь к файлу записи
+        self.replaying = False
+
+    def record(self, path, seed=None):
+        """Включает запись ввода. Файл сохраняется при выходе из программы"""
+        if seed is not None:
+            self.seed = seed
+        self.recording = path
+        self.frames = []
+        atexit.register(self.save)
+
+    def replay(self, path):
+        """Включает воспроизведение ввода из файла"""
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            magic, version, self.seed, count = struct.unpack_from(HEADER, data)
+        except (OSError, struct.error) as message:
+            print('Cannot load replay:', path)
+            raise SystemExit(message)
+        if magic != MAGIC or version != VERSION:
+            print('Cannot load replay:', path)
+            raise SystemExit('unsupported replay format')
+        self.frames = list(struct.iter_unpack(FRAME, data[struct.calcsize(HEADER):]))[:count]
+        self.cursor = 0
+        self.replaying = True
+
+    def save(self):
+        if self.recording:
+            with open(self.recording, 'wb') as file:
+                file.write(struct.pack(HEADER, MAGIC, VERSION, self.seed, len(self.frames)))
+                file.write(b''.join(struct.pack(FRAME, *frame) for frame in self.frames))
+
+    def finished(self):
+        """Закончилась ли воспроизводимая запись"""
+        return self.replaying and self.cursor >= len(self.frames)
+
+    def poll(self):
+        """Возвращает ввод для текущего кадра"""
+        events = pygame.event.get()
+        # Закрыть окно и переключить отладку можно и во время воспроизведения
+        toggle_debug = any(event.type == pygame.KEYDOWN and event.key == DEBUG_KEY
+                           for event in events)
+        if self.replaying:
+            if any(event.type == pygame.QUIT for event in events):
+                return InputFrame(0, 1 << QUIT_BIT)
+            if self.finished():
+                return InputFrame(toggle_debug=toggle_debug)
+            self.cursor += 1
+            return InputFrame(*self.frames[self.cursor - 1], toggle_debug=toggle_debug)
+
+        pressed = 0
+        for event in events:
+            if event.type == pygame.QUIT:
+                pressed |= 1 << QUIT_BIT
+            elif event.type == pygame.KEYDOWN and event.key in KEYS:
+                pressed |= 1 << KEYS.index(event.key)
+        keys = pygame.key.get_pressed()
+        held = sum(1 << bit for bit, key in enumerate(KEYS) if keys[key])
+
+        if self.recording:
+            self.frames.append((held, pressed))
+        return InputFrame(held, pressed, toggle_debug)
@@ -14,9 +14,11 @@ class FlagPole(pygame.sprite.Sprite):
         # Перевод координат из блоков в пиксели.
         self.rect.x, self.rect.y = (x - 1) * PPM, (y - 10) * PPM
         self.flag = Flag(x, y)  # Создаем флажок
+        self.started = False  # Коснулся ли Марио флагштока. По этому флагу Main готовит уровень
 
     def start(self):
         self.flag.start()
+        self.started = True
 
 
 class Flag(pygame.sprite.Sprite):
@@ -35,7 +37,7 @@ class Flag(pygame.sprite.Sprite):
         """Если скорость не равна 0, то метод опускает флажок, сбрасывает скорость, когда флажок
         коснется блока"""
         self.rect.y += self.vy
-        if self.vy and pygame.sprite.spritecollideany(self, tiles_group):
+        if self.vy and tiles_group.collideany(self):
             self.vy = 0
 
     def start(self):
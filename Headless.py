@@ -0,0 +1,60 @@
+"""Запуск игры без окна и без ограничения частоты кадров. Используется для регрессионных и
+нагрузочных тестов: игра продвигается тем же Main.update, что и в обычном режиме, но так быстро,
+как позволяет процессор, поэтому минута игры проходит за несколько секунд.
+
+    python Headless.py --frames 3600 --draw
+    python Headless.py --replay level1.rec
+    python Headless.py --replay level1.rec --draw --profile --profile-csv level1.csv
+    python Headless.py --replay level1.rec --draw --dirty-rects --profile
+"""
+import os
+import time
+import argparse
+
+# Драйвер нужно выбрать до того, как Utilities инициализирует pygame и создаст окно
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import Main
+from Utilities import FPS
+
+
+def run(frames=None, render=False):
+    """Запускает игру с первого уровня и прогоняет frames кадров. Воспроизведение записи
+    останавливается, когда она закончится, даже если frames не задано. Возвращает количество
+    прогнанных кадров"""
+    Main.start()
+    frame = 0
+    while frame != frames and not Main.controls.finished():
+        Main.update(render)
+        frame += 1
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the game without a window, uncapped.')
+    parser.add_argument('--frames', type=int,
+                        help='number of frames to simulate (default: one minute of gameplay '
+                             'or the whole replay)')
+    parser.add_argument('--draw', action='store_true',
+                        help='render every frame into the off-screen surface')
+    Main.add_controls_arguments(parser)
+    Main.add_profiler_arguments(parser)
+    Main.add_render_arguments(parser)
+    args = parser.parse_args()
+    Main.setup_controls(args)
+    Main.setup_profiler(args, overlay=args.draw)
+    Main.setup_renderer(args)
+    if args.frames is None and not args.replay:
+        args.frames = FPS * 60
+
+    start = time.perf_counter()
+    frames = run(args.frames, args.draw)
+    elapsed = time.perf_counter() - start
+    print('%d frames (%.1f s of gameplay) in %.2f s, %.0f frames/s' % (
+        frames, frames / FPS, elapsed, frames / elapsed))
+    if Main.profiler.enabled:
+        print('\n'.join(Main.profiler.report()))
+
+
+if __name__ == '__main__':
+    main()
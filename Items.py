@@ -1,6 +1,6 @@
 import pygame
-from Utilities import cut_sheet, load_image, all_sprites, items_group, players_group, \
-    enemies_group, tiles_group, hud, screen, PPM
+from Utilities import cut_sheet, load_image, Palette, Animation, Animated, Pooled, \
+    all_sprites, items_group, players_group, enemies_group, tiles_group, hud, PPM
 from BaseCharacter import BaseCharacter
 from PointsUp import PointsUp
 
@@ -8,10 +8,8 @@ from PointsUp import PointsUp
 class ItemBase(BaseCharacter):
     """Базовый класс для различных бонусов. Бонусы никак не взаимодействуют с врагами."""
 
-    # Загрузка всех изображений и распределение их на группы
-    ITEMS = {name: surf for name, surf in
-             zip(['normal', 'underground', 'castle', 'underwater'],
-                 cut_sheet(load_image("Items.png"), 19, 4))}
+    # Изображения для каждого мира загружаются при первом обращении
+    ITEMS = Palette.sheet("Items.png", 19, 4)
 
     def __init__(self, x, y):
         super().__init__(x, y, all_sprites, items_group)
@@ -19,7 +17,6 @@ class ItemBase(BaseCharacter):
 
         # Высота, до котор. нужно поднятся бонусу при появлении из блока, прежде чем начать движение
         self.uprise = self.rect.y - self.rect.h + self.rect.h // 3
-        self.create_sides()
 
     def move(self):
         """Метод, отвечающий анимацию появления бонуса из блока"""
@@ -38,11 +35,11 @@ class ItemBase(BaseCharacter):
 
         vx = self.vx  # Старое направление
         self.check_tile_collisions()
-        if vx != self.vx:  # При изменении направления отражаем картинку
+        # При изменении направления отражаем картинку. Анимированные бонусы не отражаются:
+        # присваивание image остановило бы их анимацию
+        if vx != self.vx and not isinstance(self, Animated):
             self.image = pygame.transform.flip(self.image, True, False)
 
-        self.sides_group.draw(screen)  # Отрисовка коллизий
-
 
 class MushroomSizeUp(ItemBase):
     """Класс гриба, превращающего обычного Марио в Супер Марио"""
@@ -116,22 +113,15 @@ class MushroomDeadly(ItemBase):
         pass
 
 
-class FireFlower(ItemBase):
+class FireFlower(Animated, ItemBase):
     """Класс цветка, превращающего Марио в Огненного Марио"""
 
     def __init__(self, x, y, world):
-        self.cur_frame = 0  # Счетчик кадров
         self.frames = ItemBase.ITEMS[world][3:7]  # Все кадры мерцающего цветка для этого мира
-        self.image = self.frames[self.cur_frame]
+        self.animation = Animation.track(self.frames, 5)  # Каждые 5 кадров меняем картинку
         super().__init__(x, y)
         self.vx = 0
 
-    def update(self):
-        self.cur_frame = (self.cur_frame + 1) % 60  # Обновляем счетчик кадров
-        self.image = self.frames[self.cur_frame // 5 % 4]  # Каждые 5 кадров меняем картинку
-        # тем самым создаем мерцание
-        super().update()
-
     def check_player_collisions(self):
         """Метод проверяет, подобрал ли игрок бонус, превращает Марио в Огненного,
         дает 1000 очков"""
@@ -142,39 +132,25 @@ class FireFlower(ItemBase):
             hud.add_score(1000)
             self.kill()
 
-    def check_tile_collisions(self):
-        """Переопределяем родительский check_tile_collisions, т.к. цветочку нужна только
-        нижняя коллизия (на цветок действует гравитация)"""
-        self.update_sides()
-        colided_tile = pygame.sprite.spritecollideany(self.down_side, tiles_group)
-        if colided_tile:
-            self.rect.bottom = colided_tile.rect.y
-            self.vy = min(0, self.vy)
-            self.update_sides()
-
     def create_sides(self):
         """Переопределяем родительский create_sides, т.к. цветочку нужна только
         нижняя коллизия (на цветок действует гравитация)"""
-        self.sides_group = pygame.sprite.Group()
-        self.down_side = pygame.sprite.Sprite(self.sides_group)
+        self.top_side = self.left_side = self.right_side = None
+        self.down_side = pygame.Rect(0, 0, 0, 0)
         self.update_sides()
 
-        self.down_side.image = pygame.Surface((self.rect.w, 1))
-        self.down_side.image.fill((0, 255, 0))
-
     def update_sides(self):
         """Переопределяем родительский update_sides, т.к. цветочку нужна только
         нижняя коллизия (на цветок действует гравитация)"""
-        self.down_side.rect = pygame.Rect(self.rect.x, self.rect.bottom, self.rect.w, 1)
+        self.down_side.update(self.rect.x, self.rect.bottom, self.rect.w, 1)
 
 
-class Star(ItemBase):
+class Star(Animated, ItemBase):
     """Класс звездочки, дающей игроку бессмертие"""
 
     def __init__(self, x, y, world):
-        self.cur_frame = 0
         self.frames = ItemBase.ITEMS[world][7:11]
-        self.image = self.frames[self.cur_frame]
+        self.animation = Animation.track(self.frames, 5)  # Каждые 5 кадров меняем изображение
         super().__init__(x, y)
 
         # Количество кадров, когда у звезды будет максимальная отрицательная вертикальная скорость
@@ -183,15 +159,11 @@ class Star(ItemBase):
         self.invincibility_time = 600  # Время неуязвимости в кадрах
 
     def update(self):
-        self.cur_frame = (self.cur_frame + 1) % 60  # Обновление счетчика кадров
-        self.image = self.frames[self.cur_frame // 5 % 4]  # Каждые 5 кадров меняем изображение,
-        # тем самым создаем мерцание
-
         if self.cur_jump < self.max_jumps:  # Блок кода, совершающий прыжки
             self.vy = - self.max_vy
             self.cur_jump += 1
         super().update()
-        if pygame.sprite.spritecollideany(self.down_side, tiles_group):
+        if tiles_group.collide(self.down_side):
             self.cur_jump = 0  # Обнуляем кол-во совершенных прыжков, если звезда касается земли
 
     def check_player_collisions(self):
@@ -202,19 +174,15 @@ class Star(ItemBase):
             collided.become_invincible(self.invincibility_time, True)
             self.kill()
 
-    def check_tile_collisions(self):
-        """Расширяем родительский метод check_tile_collisions. Звезда может прыгать, поэтому ей
-        нужна верхняя коллизия"""
-        super().check_tile_collisions()
-        colided_tile = pygame.sprite.spritecollideany(self.top_side, tiles_group)
-        if colided_tile:  # Если звезда сталкивается с блоком вверху
+    def hit_tile(self, normal, tile):
+        """Расширяем родительский метод hit_tile. Звезда может прыгать, поэтому ей важна
+        верхняя коллизия"""
+        super().hit_tile(normal, tile)
+        if normal[1] > 0:  # Если звезда сталкивается с блоком вверху
             self.cur_jump = self.max_jumps  # то не может больше прыгать
-            self.rect.y = colided_tile.rect.bottom  # Вытаскиваем из-за текстур
-            self.vy = max(0, self.vy)  # Может лететь только вниз
-            self.update_sides()
 
 
-class CoinStatic(pygame.sprite.Sprite):
+class CoinStatic(Animated, pygame.sprite.Sprite):
     """Класс статичной подбираемой монетки. Не наследуется от ItemBase, т.к. нет коллизий,
     скорости, не может появляется из блока"""
 
@@ -225,15 +193,11 @@ class CoinStatic(pygame.sprite.Sprite):
     def _load_image(self, x, y):
         """Внутренний метод для загрузки изображений"""
         super().__init__(all_sprites, items_group)
-        self.cur_frame = 0  # Счетчик кадров
-        self.image = self.frames[self.cur_frame]
+        self.animation = Animation.track(self.frames, 5)  # Каждые 5 кадров меняем картинку
         self.rect = self.image.get_rect()
         self.rect = self.rect.move((x - 1) * PPM, y * PPM)
 
     def update(self):
-        self.cur_frame = (self.cur_frame + 1) % 60  # Обновление счетчика кадров
-        self.image = self.frames[self.cur_frame // 5 % 4]  # Каждые 5 кадров меняем картинку
-        # тем самым создаем мерцание
         self.check_player_collisions()
 
     def check_player_collisions(self):
@@ -245,7 +209,7 @@ class CoinStatic(pygame.sprite.Sprite):
             self.kill()
 
 
-class Coin(CoinStatic):
+class Coin(Pooled, CoinStatic):
     """Класс вылетающей из блока монеты"""
 
     def __init__(self, x, y, world):
@@ -276,7 +240,7 @@ class Coin(CoinStatic):
         pass
 
 
-class Fire(BaseCharacter):
+class Fire(Pooled, Animated, BaseCharacter):
     """Класс фаерболов, выпусаемых Огненным Марио. Убивают врагов одним выстрелом, взрываются
     при контакте с боком блока, отскакивают от верха, не взаимодействуют с игроком"""
     IMAGES = cut_sheet(load_image("fire.png"), 4, 1)[0]  # Загрузка всех изображений фаербола
@@ -287,8 +251,8 @@ class Fire(BaseCharacter):
 
     def __init__(self, x, y, direction):
         """direction зависит от Направления марио"""
-        self.cur_frame = 0  # Счетчик кадров
-        self.image = Fire.FLYING[self.cur_frame]
+        # Каждые 15 кадров меняется изображение, тем самым достигается анимация вращения в полете
+        self.animation = Animation.track(Fire.FLYING, 15)
         super().__init__(x, y, all_sprites, items_group)
         self.vx = 5 * direction  # Горизонтальная скорость в пикселях на кадр
 
@@ -297,8 +261,6 @@ class Fire(BaseCharacter):
         self.explosion_end = 17  # Общее время анимации взрыва в кадрах
 
     def update(self):
-        self.cur_frame = (self.cur_frame + 1) % 60  # Обновление счетчика кадров
-
         if self.explosion:  # Воспроизведение анимации взрыва
             self.image = Fire.EXPLODE[self.explosion_time // 6]
             self.explosion_time += 1
@@ -306,40 +268,22 @@ class Fire(BaseCharacter):
                 self.kill()
             return
 
-        self.image = Fire.FLYING[self.cur_frame // 15 % 4]  # Каждые 15 кадров обновляем изборажение
-        # тем самым достигается анимация вращения в полете
-
         self.update_coords()  # Обновляем y координату
         self.rect.x += self.vx  # Обновляем x координату
         self.check_tile_collisions()
         self.check_enemies_collisions()
 
-        self.sides_group.draw(screen)  # Отрисовка коллизий
-
-    def check_tile_collisions(self):
-        """Изменение направления движения при столкновении с блоком либо запуск взрыва.
-        Переопределяет родительский метод check_tile_collisions, т.к. фаербол имеет уникальное
-        поведение"""
-        self.update_sides()
-        for side in [self.left_side, self.right_side]:
-            colided_tile = pygame.sprite.spritecollideany(side, tiles_group)
-            if colided_tile:
-                self.vx = 0
-                self.explosion = True
-                self.update_sides()
-                return
-
-        colided_tile = pygame.sprite.spritecollideany(self.down_side, tiles_group)
-        if colided_tile:
-            self.rect.bottom = colided_tile.rect.y
+    def hit_tile(self, normal, tile):
+        """Отскок от пола и потолка либо запуск взрыва при столкновении с боком блока.
+        Переопределяет родительский метод hit_tile, т.к. фаербол имеет уникальное поведение"""
+        nx, ny = normal
+        if nx:
+            self.vx = 0
+            self.explosion = True
+        elif ny < 0:
             self.vy = -self.max_vy
-            self.update_sides()
-
-        colided_tile = pygame.sprite.spritecollideany(self.top_side, tiles_group)
-        if colided_tile:
-            self.rect.y = colided_tile.rect.bottom
+        else:
             self.vy = self.max_vy
-            self.update_sides()
 
     def check_enemies_collisions(self):
         """Быстрое убийство врага при соприкосновении"""
@@ -1,28 +1,24 @@
 import pygame
-from Utilities import cut_sheet, load_image, all_sprites, enemies_group, tiles_group, screen, \
-    hud, PPM
+from Utilities import cut_row, flip_frames, Palette, Animation, Animated, WORLDS, all_sprites, \
+    enemies_group, tiles_group, hud, PPM, rect_collide
 from BaseCharacter import BaseCharacter
 from PointsUp import PointsUp
 import Map
 
 
-class Koopa(BaseCharacter):
+class Koopa(Animated, BaseCharacter):
     """Класс Купы (враждебной черепахи). Может скрываться в панцирь, кататься по уровню, убивая
     других врагов и игрока"""
 
-    # Загрузка всех изображений и распределение их на группы.
+    # Изображения для каждого мира загружаются при первом обращении.
     # Изображение скрытой в панцирь Купы приходится грузить отдельно, т.к. оно имеет другую высоту
-    IMAGES = {name: (surf1 + surf2) for name, surf1, surf2 in
-              zip(['normal', 'underground', 'castle', 'underwater'],
-                  cut_sheet(load_image("Koopa.png"), 4, 4),
-                  cut_sheet(load_image("Koopa_hidden.png"), 2, 4))}
+    IMAGES = Palette('Koopa', lambda world: cut_row("Koopa.png", 4, 4, WORLDS.index(world)) +
+                     cut_row("Koopa_hidden.png", 2, 4, WORLDS.index(world)))
 
-    L_KOOPA = {key: images[:2] + images[4:6] for
-               key, images in IMAGES.items()}
+    L_KOOPA = Palette('L_Koopa', lambda world: Koopa.IMAGES[world][:2] + Koopa.IMAGES[world][4:6])
 
     # Зеркальные изображения для другого направления движения
-    R_KOOPA = {key: [pygame.transform.flip(frame, True, False) for frame in images]
-               for key, images in L_KOOPA.items()}
+    R_KOOPA = Palette('R_Koopa', lambda world: flip_frames(Koopa.L_KOOPA[world]))
 
     def __init__(self, x, y, world):
         self.world = world
@@ -31,10 +27,9 @@ class Koopa(BaseCharacter):
         self.REVIVAL_TIME = 60 * 6  # Время появление лапок Купы из панциря в кадрах
 
         self.SMERT_TIME = 60 * 8  # Время выхода Купы из панциря в кадрах
-        self.cur_frame = 0  # Счетчик кадров
 
         self._load_frames()
-        self.image = self.frames[self.cur_frame]
+        self.walk()
         super().__init__(x, y, all_sprites, enemies_group)
         self.vx = -2  # Скорость в пикселях на кард
         self.value = 400  # Количество очков за убийство
@@ -47,6 +42,10 @@ class Koopa(BaseCharacter):
         self.r_frames = Koopa.R_KOOPA[self.world]
         self.frames = self.l_frames
 
+    def walk(self):
+        """Запуск анимации шагов в текущем направлении: каждые 15 кадров меняется картинка"""
+        self.animation = Animation.track(self.frames[:2], 15)
+
     def load_image(self, index):
         """Метод загрузки изображений с сохранением координат после изменения высоты изображения"""
         topleft = self.rect.topleft
@@ -60,9 +59,12 @@ class Koopa(BaseCharacter):
         self.check_tile_collisions()
 
         # Выбор кадров в зависимости от направления движения
-        self.frames = self.l_frames if self.vx < 0 else self.r_frames
+        frames = self.l_frames if self.vx < 0 else self.r_frames
+        if frames is not self.frames:
+            self.frames = frames
+            if not self.smert:
+                self.walk()
         self.check_enemies_collisions()
-        self.sides_group.draw(screen)  # Отрисовка колизий
 
         if self.smert:  # Анимации скрытой Купы, скрытой Купы с лапками, выхода Купы из панциря
             if not self.vx:
@@ -71,14 +73,11 @@ class Koopa(BaseCharacter):
                     # скрытая Купа с лапками
                     self.image = self.frames[3]
                 elif self.smert == self.SMERT_TIME:
-                    self.load_image(self.cur_frame // 15 % 2)
+                    self.load_image(0)
                     # обычная шагающая Купа
+                    self.walk()
                     self.smert = 0
                     self.vx = -2
-        else:
-            self.cur_frame = (self.cur_frame + 1) % 60  # Обновление счетчика кадров
-            self.image = self.frames[self.cur_frame // 15 % 2]  # Каждый 15 кадр обновляем картинку,
-            # тем самым создается анимация шагов
 
     def die(self, rate):
         """rate - множитель очков, выдающихся при убийстве Купы. Позволяет делать комбо"""
@@ -108,8 +107,7 @@ class Koopa(BaseCharacter):
     def check_enemies_collisions(self):
         if self.smert and self.vx:
             # Убийство врагов ездящей Купой
-            [enemy.die(2) if enemy is not self else None for enemy in
-             pygame.sprite.spritecollide(self, enemies_group, False)]
+            [enemy.die(2) for enemy in rect_collide(self.rect, enemies_group.candidates(self))]
         else:
             # В обычном состоянии Купа меняет направление при столкновении с врагом
             super().check_enemies_collisions()
@@ -118,11 +116,11 @@ class Koopa(BaseCharacter):
 class JumpingKoopa(Koopa):
     """Класс Прыгающей Купы (враждебной черепахи). После того, как игрок наступает, превращается в
     обычную Купу. Может прыгать, имеет пониженную гравитацию из-за крыльев"""
-    L_FLYING_KOOPA = {key: images[2:6] for key, images in Koopa.IMAGES.items()}
+    L_FLYING_KOOPA = Palette('L_FlyingKoopa', lambda world: Koopa.IMAGES[world][2:6])
 
     # Зеркальные изображения для другого направления движения
-    R_FLYING_KOOPA = {key: [pygame.transform.flip(frame, True, False) for frame in images]
-                      for key, images in L_FLYING_KOOPA.items()}
+    R_FLYING_KOOPA = Palette('R_FlyingKoopa',
+                             lambda world: flip_frames(JumpingKoopa.L_FLYING_KOOPA[world]))
 
     def __init__(self, x, y, world):
         super().__init__(x, y, world)
@@ -143,7 +141,7 @@ class JumpingKoopa(Koopa):
 
     def update(self):
         super().update()
-        if pygame.sprite.spritecollideany(self.down_side, tiles_group):
+        if tiles_group.collide(self.down_side):
             self.cur_jump = 0  # Обнуляем кол-во совершенных прыжков, если Купа касается земли
         if self.cur_jump < self.max_jumps:
             # Блок кода, совершающий прыжки
@@ -155,13 +153,9 @@ class JumpingKoopa(Koopa):
         Koopa(self.rect.x / PPM + 1, self.rect.y / PPM, self.world).die(rate)
         self.kill()
 
-    def check_tile_collisions(self):
-        """Расширяем родительский метод check_tile_collisions. Купа может прыгать, поэтому ей
-        нужна верхняя коллизия"""
-        super().check_tile_collisions()
-        colided_tile = pygame.sprite.spritecollideany(self.top_side, tiles_group)
-        if colided_tile:  # Если Купа сталкивается с блоком вверху
+    def hit_tile(self, normal, tile):
+        """Расширяем родительский метод hit_tile. Купа может прыгать, поэтому ей важна
+        верхняя коллизия"""
+        super().hit_tile(normal, tile)
+        if normal[1] > 0:  # Если Купа сталкивается с блоком вверху
             self.cur_jump = self.max_jumps  # то не может больше прыгать
-            self.rect.y = colided_tile.rect.bottom  # Вытаскиваем из-за текстур
-            self.vy = max(0, self.vy)  # Может лететь только вниз
-            self.update_sides()
@@ -0,0 +1,201 @@
+"""Компилятор уровней из json в двоичный формат .lvl. Скомпилированный уровень читается через
+mmap и struct без разбора json, а Map.load_level берет его вместо json, если он свежее.
+
+    python LevelCompiler.py
+    python LevelCompiler.py level1 level2
+
+Формат (все числа little-endian):
+    заголовок: MAGIC, версия, мир и название мира (длина и utf8), размеры уровня, игрок, замок,
+    флагшток, размеры сетки и количество записей в таблицах ниже;
+    сетка тайлов: по байту на блок, строка за строкой, i-й бит - есть ли в блоке тайл TILES[i]
+    (в одном блоке бывает несколько тайлов);
+    столбцы без пола: по числу на столбец;
+    бонусы блоков со знаком вопроса: столбец, строка и код из BONUSES;
+    таблица объектов: группы объектов одного вида из ENTITIES в одной строке - заголовок
+    ENTITY_GROUP и массив столбцов (у труб и холмов - пар столбец, высота);
+    блоки с предметами: код из BLOCKS, координаты и код предмета из ITEMS.
+"""
+import os
+import mmap
+import json
+import struct
+import argparse
+from collections import defaultdict
+from itertools import compress
+
+MAGIC = b'MLVL'
+VERSION = 1
+LEVELS_DIR = os.path.join('data', 'levels')
+
+HEADER = '<4sH'
+META = '<HHdddd?ddHHHHHH'
+BONUS = '<HHB'
+ENTITY_GROUP = '<BdcH'  # Вид, строка, тип чисел массива (H или d), длина массива
+BLOCK = '<BddB'
+
+# Ключи json, соответствующие кодам. Порядок менять нельзя без увеличения VERSION
+TILES = ['bricks', 'stones', 'quests']
+BONUSES = ['sizeup', 'liveup', 'star', 'flower']
+ENTITIES = ['goombas', 'koopas', 'jkoopas', 'tubes', 'grass_hills', 'grass', 'clouds']
+BLOCKS = ['BonusBrick', 'InvincibleTile']
+ITEMS = ['Coin', 'MushroomSizeUp', 'MushroomLiveUp', 'MushroomDeadly', 'FireFlower', 'Star']
+
+# Объекты, у которых в json кроме столбца есть аргумент: [x, аргумент]
+WITH_ARGUMENT = {'tubes', 'grass_hills'}
+
+# Таблицы для bytes.translate: байт сетки -> 1, если в блоке есть тайл TILES[i], иначе 0
+MASKS = [bytes(bits >> bit & 1 for bits in range(256)) for bit in range(len(TILES))]
+
+
+class LevelError(ValueError):
+    """Уровень не удалось прочитать или он составлен неправильно. Только такие ошибки
+    означают, что уровень нужно пропустить: остальные исключения - ошибки самой игры"""
+
+
+def pack_string(text):
+    data = text.encode('utf8')
+    return struct.pack('<B', len(data)) + data
+
+
+def unpack_string(data, offset):
+    size, = struct.unpack_from('<B', data, offset)
+    offset += 1
+    return bytes(data[offset:offset + size]).decode('utf8'), offset + size
+
+
+def number(value):
+    """Координаты хранятся как double, целые возвращаются в int, как были в json"""
+    return int(value) if value.is_integer() else value
+
+
+def compile_level(source, target):
+    """Компилирует json-уровень source в файл target"""
+    with open(source, encoding='utf8') as file:
+        level = json.load(file)
+
+    cells = defaultdict(int)  # (x, y) -> биты тайлов блока
+    for bit, key in enumerate(TILES):
+        for y, xs in level.get(key, {}).items():
+            for x in xs:
+                if not (float(y).is_integer() and float(x).is_integer()):
+                    raise LevelError('%s: tile %s at (%s, %s) is not on the grid' % (
+                        source, key, x, y))
+                cells[int(x), int(float(y))] |= 1 << bit
+    grid_w = max([x for x, y in cells] + [-1]) + 1
+    grid_h = max([y for x, y in cells] + [-1]) + 1
+    grid = bytearray(grid_w * grid_h)
+    for (x, y), bits in cells.items():
+        grid[y * grid_w + x] = bits
+
+    bonuses = [struct.pack(BONUS, x, y, code) for code, key in enumerate(BONUSES)
+               for x, y in level.get(key, [])]
+
+    entities = []
+    for code, key in enumerate(ENTITIES):
+        for y, xs in level.get(key, {}).items():
+            values = [value for x in xs for value in x] if key in WITH_ARGUMENT else xs
+            kind = b'H' if all(float(value).is_integer() for value in values) else b'd'
+            entities.append(struct.pack(ENTITY_GROUP, code, float(y), kind, len(values)) +
+                            struct.pack('<%d%s' % (len(values), kind.decode()), *values))
+
+    blocks = [struct.pack(BLOCK, code, x, y, ITEMS.index(item))
+              for code, key in enumerate(BLOCKS) for x, y, item in level.get(key, [])]
+
+    castle_x, castle_y, castle_big = level['castle']
+    meta = struct.pack(META, *level['size'], *level['player'], castle_x, castle_y, castle_big,
+                       *level['flagpole'], grid_w, grid_h, len(level['empty']), len(bonuses),
+                       len(entities), len(blocks))
+    data = b''.join([struct.pack(HEADER, MAGIC, VERSION), pack_string(level['world']),
+                     pack_string(level['world_name']), meta, bytes(grid),
+                     struct.pack('<%dH' % len(level['empty']), *level['empty'])] +
+                    bonuses + entities + blocks)
+    with open(target + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(target + '.tmp', target)  # Чтобы не оставить недописанный файл
+    return len(data)
+
+
+def load_compiled(path):
+    """Загрузка скомпилированного уровня в такой же словарь, какой дает Map.load_json.
+    Бросает LevelError, если файл не того формата, другой версии или испорчен"""
+    try:
+        return read_compiled(path)
+    except (ValueError, struct.error, IndexError) as message:  # В том числе LevelError
+        raise LevelError('%s: %s' % (path, message)) from message
+
+
+def read_compiled(path):
+    """Разбор файла для load_compiled"""
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version = struct.unpack_from(HEADER, data)
+            if magic != MAGIC or version != VERSION:
+                raise LevelError('unsupported level format')
+            world, offset = unpack_string(data, struct.calcsize(HEADER))
+            world_name, offset = unpack_string(data, offset)
+            (width, height, player_x, player_y, castle_x, castle_y, castle_big, flagpole_x,
+             flagpole_y, grid_w, grid_h, empty, bonuses, entities, blocks) = struct.unpack_from(
+                META, data, offset)
+            offset += struct.calcsize(META)
+
+            level = {'world': world, 'world_name': world_name, 'size': [width, height],
+                     'player': [number(player_x), number(player_y)],
+                     'castle': [number(castle_x), number(castle_y), castle_big],
+                     'flagpole': [number(flagpole_x), number(flagpole_y)]}
+            for key in TILES + ENTITIES:
+                level[key] = {}
+            for key in BONUSES + BLOCKS:
+                level[key] = []
+
+            grid = data[offset:offset + grid_w * grid_h]
+            for key, mask in zip(TILES, MASKS):
+                cells = grid.translate(mask)
+                for y in range(grid_h):
+                    row = cells[y * grid_w:(y + 1) * grid_w]
+                    if 1 in row:  # Столбцы строки выбираются без цикла на Python
+                        level[key][float(y)] = list(compress(range(grid_w), row))
+            offset += grid_w * grid_h
+
+            level['empty'] = list(struct.unpack_from('<%dH' % empty, data, offset))
+            offset += struct.calcsize('<%dH' % empty)
+
+            for x, y, code in struct.iter_unpack(
+                    BONUS, data[offset:offset + bonuses * struct.calcsize(BONUS)]):
+                level[BONUSES[code]].append([x, y])
+            offset += bonuses * struct.calcsize(BONUS)
+
+            for _ in range(entities):
+                code, y, kind, count = struct.unpack_from(ENTITY_GROUP, data, offset)
+                offset += struct.calcsize(ENTITY_GROUP)
+                array = '<%d%s' % (count, kind.decode())
+                values = list(struct.unpack_from(array, data, offset))
+                offset += struct.calcsize(array)
+                if ENTITIES[code] in WITH_ARGUMENT:
+                    values = [list(pair) for pair in zip(values[::2], values[1::2])]
+                level[ENTITIES[code]][y] = values
+
+            for code, x, y, item in struct.iter_unpack(
+                    BLOCK, data[offset:offset + blocks * struct.calcsize(BLOCK)]):
+                level[BLOCKS[code]].append([number(x), number(y), ITEMS[item]])
+    return level
+
+
+def compiled_path(name):
+    return os.path.join(LEVELS_DIR, name + '.lvl')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile JSON levels into the binary format.')
+    parser.add_argument('levels', nargs='*',
+                        help='level names without extension (default: every level in %s)'
+                             % LEVELS_DIR)
+    args = parser.parse_args()
+    names = args.levels or sorted(name[:-len('.json')] for name in os.listdir(LEVELS_DIR)
+                                  if name.endswith('.json'))
+    for name in names:
+        size = compile_level(os.path.join(LEVELS_DIR, name + '.json'), compiled_path(name))
+        print('%s.json -> %s (%d bytes)' % (name, compiled_path(name), size))
+
+
+if __name__ == '__main__':
+    main()
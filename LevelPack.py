@@ -0,0 +1,185 @@
+"""Набор уровней игры: все json-уровни каталога data/levels в порядке номеров в названиях
+(level2 идет раньше level10). Для каждого уровня известны его номер, мир и размеры, а сам
+уровень загружается Map только тогда, когда до него дошла игра.
+
+Сведения об уровнях хранятся в манифесте MANIFEST вместе со временем изменения и размером
+файла. При запуске файлы уровней только перечисляются вместе с этими данными, а разбираются и
+проверяются заново лишь новые и изменившиеся, в том числе исправленные на месте. Уровни,
+которые не прошли проверку, в набор не попадают.
+"""
+import os
+import re
+import json
+from collections import namedtuple
+from Utilities import CACHE_DIR, WORLDS
+from LevelCompiler import ITEMS, LevelError
+
+LEVELS_DIR = os.path.join('data', 'levels')
+MANIFEST = os.path.join(CACHE_DIR, 'levels.json')
+VERSION = 2  # Увеличивается при изменении проверок, чтобы уровни проверились заново
+
+# Ключи, без которых MapBase не построит уровень, и количество чисел в них. Остальные ключи
+# необязательны: Map.load_json подставляет вместо них пустой список
+POINTS = {'size': 2, 'player': 2, 'castle': 3, 'flagpole': 2}
+# Необязательные ключи по виду значения, в том виде, в каком их разбирает MapBase
+ROWS = ['bricks', 'stones', 'quests', 'goombas', 'koopas', 'jkoopas', 'grass', 'clouds']
+ROW_PAIRS = ['tubes', 'grass_hills']  # Строка -> пары [столбец, высота]
+CELLS = ['sizeup', 'liveup', 'star', 'flower']  # Пары [столбец, строка]
+BLOCKS = ['BonusBrick', 'InvincibleTile']  # Тройки [столбец, строка, предмет]
+
+LevelInfo = namedtuple('LevelInfo', 'name world size')
+
+
+def natural_key(name):
+    """Ключ сортировки, при котором числа в названии сравниваются как числа"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_row_key(key):
+    """Ключи словарей строк в json - строки с номером строки"""
+    try:
+        float(key)
+    except ValueError:
+        return False
+    return True
+
+
+def check_optional(level):
+    """Проверка необязательных ключей. Бросает LevelError, если ключ составлен неправильно"""
+    for key in ROWS + ROW_PAIRS:
+        rows = level.get(key, {})
+        if not (isinstance(rows, dict) and all(map(is_row_key, rows)) and
+                all(isinstance(row, list) for row in rows.values())):
+            raise LevelError('%s must map row numbers to lists' % key)
+        for row in rows.values():
+            if key in ROW_PAIRS:
+                valid = all(isinstance(pair, list) and len(pair) == 2 and
+                            all(map(is_number, pair)) for pair in row)
+            else:
+                valid = all(map(is_number, row))
+            if not valid:
+                raise LevelError('%s has a malformed row' % key)
+    for key in CELLS + BLOCKS:
+        cells = level.get(key, [])
+        size = 3 if key in BLOCKS else 2
+        if not (isinstance(cells, list) and all(
+                isinstance(cell, list) and len(cell) == size and
+                is_number(cell[0]) and is_number(cell[1]) for cell in cells)):
+            raise LevelError('%s must be a list of [x, y%s] lists' % (
+                key, ', item' if size == 3 else ''))
+        if key in BLOCKS and any(cell[2] not in ITEMS for cell in cells):
+            raise LevelError('%s has an unknown item' % key)
+    empty = level.get('empty', [])
+    if not (isinstance(empty, list) and all(map(is_number, empty))):
+        raise LevelError('empty must be a list of columns')
+
+
+def validate(level):
+    """Проверка уровня до того, как MapBase начнет его строить. Бросает LevelError, если
+    уровень неправильный"""
+    if not isinstance(level, dict):
+        raise LevelError('not a JSON object')
+    if level.get('world') not in WORLDS:
+        raise LevelError('unknown world %r' % level.get('world'))
+    if not isinstance(level.get('world_name'), str):
+        raise LevelError('world_name is missing')
+    for key, count in POINTS.items():
+        value = level.get(key)
+        if not (isinstance(value, list) and len(value) == count and
+                all(isinstance(number, (int, float)) for number in value)):
+            raise LevelError('%s must be a list of %d numbers' % (key, count))
+    if level['size'][0] <= 0 or level['size'][1] <= 0:
+        raise LevelError('size must be positive')
+    check_optional(level)
+
+
+class LevelPack:
+    """Упорядоченный набор уровней. pack[i] - LevelInfo i-го уровня, len(pack) - их количество.
+    Уровень, который все же не загрузился во время игры (файл удалили или испортили после
+    построения манифеста), убирается из набора через drop, чтобы игра шла дальше без него"""
+
+    def __init__(self, directory=LEVELS_DIR, manifest=MANIFEST):
+        self.directory = directory
+        self.manifest = manifest
+        self.levels = []
+        self.load()
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        return self.levels[index]
+
+    def load(self):
+        """Строит набор по каталогу уровней, беря сведения о неизменившихся файлах из манифеста"""
+        try:
+            manifest = self.scan(self.read_manifest().get('files', {}))
+        except OSError as message:
+            print('Cannot open levels directory:', self.directory, message)
+            return
+        self.levels = [LevelInfo(name, entry['world'], tuple(entry['size']))
+                       for name, entry in manifest['files'].items() if entry.get('error') is None]
+        self.levels.sort(key=lambda level: natural_key(level.name))
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest, encoding='utf8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) and manifest.get('version') == VERSION \
+            else {}
+
+    def scan(self, known):
+        """Просмотр каталога. Файлы, у которых время изменения и размер те же, что в манифесте,
+        повторно не читаются. Неправильные уровни тоже записываются в манифест, с текстом ошибки,
+        чтобы не проверять их при каждом запуске, пока файл не изменится. Манифест
+        перезаписывается, только если что-то изменилось"""
+        files = {}
+        for item in os.scandir(self.directory):
+            if not item.name.endswith('.json'):
+                continue
+            name = item.name[:-len('.json')]
+            stat = item.stat()
+            entry = known.get(name)
+            if not (entry and entry.get('mtime') == stat.st_mtime_ns and
+                    entry.get('bytes') == stat.st_size):
+                entry = self.inspect(item.path)
+                entry.update(mtime=stat.st_mtime_ns, bytes=stat.st_size)
+                if entry['error']:
+                    print('Skipping level %s: %s' % (item.path, entry['error']))
+            files[name] = entry
+        manifest = {'version': VERSION, 'files': files}
+        if files != known:
+            self.save_manifest(manifest)
+        return manifest
+
+    @staticmethod
+    def inspect(path):
+        """Запись манифеста для одного файла уровня"""
+        try:
+            with open(path, encoding='utf8') as file:
+                level = json.load(file)
+            validate(level)
+        except (OSError, ValueError) as message:  # ValueError - в том числе LevelError
+            return {'error': str(message)}
+        return {'error': None, 'world': level['world'], 'size': level['size']}
+
+    def save_manifest(self, manifest):
+        """Ошибки записи не мешают игре, в худшем случае файлы проверятся в следующий раз"""
+        try:
+            os.makedirs(os.path.dirname(self.manifest), exist_ok=True)
+            with open(self.manifest + '.tmp', 'w', encoding='utf8') as file:
+                json.dump(manifest, file)
+            os.replace(self.manifest + '.tmp', self.manifest)  # Чтобы не оставить недописанный
+        except OSError:
+            pass
+
+    def drop(self, index):
+        """Убирает из набора уровень, который не удалось загрузить"""
+        print('Skipping level %s' % self.levels[index].name)
+        del self.levels[index]
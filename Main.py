@@ -1,54 +1,175 @@
+import argparse
 import pygame
-from Utilities import hud, screen, FPS, camera, all_sprites, players_group, groups
+from Utilities import hud, screen, FPS, camera, all_sprites, players_group, enemies_group, \
+    culled_groups, rng, debug, clock
+from Controls import Controls, MAX_SEED
+from Profiler import FrameProfiler
+from Render import FullRenderer, DirtyRenderer
+from LevelPack import LevelPack
+from LevelCompiler import LevelError
 import Utilities
 import Map
 
+pack = LevelPack()  # Уровни игры по порядку, см. LevelPack
+current_level = 0  # Индекс текущего уровня
+controls = Controls()  # Источник ввода: клавиатура, запись или воспроизведение
+profiler = FrameProfiler()  # Замеры времени фаз кадра, по умолчанию выключен
+renderer = FullRenderer()  # Отрисовка кадра и вывод его на дисплей, см. Render
 
-def main():
-    time = pygame.time.Clock()
 
-    levels = ['level1', 'level2']  # Названия уровней
-    current_level = 0  # Индекс текущего уровня
-    Map.load_level(levels[current_level], Utilities)  # Создание спрайтов уровня
+def start():
+    """Загрузка первого уровня. Генератор случайных чисел инициализируется зерном из controls,
+    чтобы игра с одним и тем же вводом проходила одинаково"""
+    rng.seed(controls.seed)
+    load_level(0)  # Создание спрайтов уровня
 
-    while True:
-        # Обновление интерфейса
-        hud.update()
-
-        if hud.get_load_level_request():
-            # Если hud сообщает, что закончилось время или жизни, то загружаем первый уровень
-            Map.load_level(levels[0], Utilities, resetscore=True)
-            hud.set_lives(3)  # Возвращаем жизни. Время откатится автоматически
-        elif hud.get_game_over():
-            # Если hud сообщает, что выводит заставку game over, то  не делаем ничего,
-            # кроме смены кадров
-            time.tick(FPS)
-            pygame.display.flip()
+
+def load_level(index, resetscore=False):
+    """Загрузка уровня номер index из pack. Уровень, который не удалось прочитать или который не
+    прошел проверку (файл испортили после построения манифеста), убирается из набора, и вместо
+    него загружается следующий, чтобы игра не останавливалась. Без уровней вообще игра
+    завершается"""
+    global current_level
+    while pack:
+        current_level = index % len(pack)
+        try:
+            Map.load_level(pack[current_level].name, Utilities, resetscore)
+        except LevelError as message:
+            print('Cannot load level %s: %s' % (pack[current_level].name, message))
+            pack.drop(current_level)  # Следующий уровень сдвинулся на место index
             continue
+        profiler.level = pack[current_level].name
+        return
+    raise SystemExit('No playable levels in %s' % pack.directory)
+
+
+def update(render=True):
+    """Один кадр игры: обновление всех объектов и, если render, отрисовка в screen.
+    Скорости всех объектов заданы в пикселях на кадр, поэтому каждый вызов продвигает игру ровно
+    на 1 / FPS секунды, независимо от того, как часто эта функция вызывается"""
+    profiler.begin()
+
+    # Обновление интерфейса
+    hud.update()
+
+    if hud.get_load_level_request():
+        # Если hud сообщает, что закончилось время или жизни, то загружаем первый уровень
+        load_level(0, resetscore=True)
+        hud.set_lives(3)  # Возвращаем жизни. Время откатится автоматически
+    elif hud.get_game_over():
+        # Если hud сообщает, что выводит заставку game over, то  не делаем ничего,
+        # кроме смены кадров
+        return
 
-        # Условие, сигнализирующее об окончании уровня и подсчета очков
-        if Map.get_player().get_flagpoled() and not hud.get_time():
-            # Загружаем следующий или первый уровень
-            current_level = (current_level + 1) % len(levels)
-            Map.load_level(levels[current_level], Utilities)
+    if Map.get_map().flagpole.started:
+        # Пока Марио спускается и идет подсчет очков, следующий уровень готовится в фоне
+        Map.preload(pack[(current_level + 1) % len(pack)].name)
 
-        Map.get_player().process_events(pygame.event.get())  # Разбором событий занимается player
-        screen.fill((92, 148, 252))
+    # Условие, сигнализирующее об окончании уровня и подсчета очков
+    if Map.get_player().get_flagpoled() and not hud.get_time():
+        # Загружаем следующий или первый уровень
+        load_level(current_level + 1)
 
-        # изменяем ракурс камеры
-        camera.update(Map.get_player())
-        # обновляем положение всех спрайтов
-        for sprite in all_sprites:
-            camera.apply(sprite)
+    frame = controls.poll()
+    if frame.toggle_debug:
+        debug.toggle()
+    Map.get_player().process_events(frame)  # Разбором ввода занимается player
+    profiler.mark('input')
 
-        players_group.update()
-        all_sprites.update()
+    # изменяем ракурс камеры
+    camera.update(Map.get_player())
+    Map.get_map().update(camera)  # создаем объекты, к которым подошла камера
+    # удаляем объекты, покинувшие уровень
+    for group in culled_groups:
+        camera.cull(group)
+    profiler.mark('camera')
 
-        [group.draw(screen) for group in groups]  # отрисовка групп в нужном порядке
+    players_group.update()
+    profiler.mark('players')
+    enemies_group.build_pairs()  # широкая фаза столкновений врагов друг с другом
+    all_sprites.update()
+    clock.tick()  # один тик часов анимаций на кадр, кадры выбираются при отрисовке
+    profiler.mark('sprites')
+
+    if render:
+        renderer.draw(screen, overlay=profiler.overlay)
+        profiler.mark('draw')
         hud.draw(screen)  # hud рисуется всегда поверх
+        profiler.mark('hud')
+    profiler.end()
+    if render:
+        profiler.draw(screen, hud.get_height())
+
+
+def seed_argument(text):
+    """Тип аргумента --seed. Зерно проверяется сразу: не поместившееся в заголовок записи
+    зерно сломало бы сохранение записи при выходе"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('seed must be an integer, got %r' % text)
+    if not 0 <= value <= MAX_SEED:
+        raise argparse.ArgumentTypeError('seed must be between 0 and %d' % MAX_SEED)
+    return value
+
+
+def add_controls_arguments(parser):
+    """Аргументы командной строки для записи и воспроизведения ввода"""
+    parser.add_argument('--record', metavar='FILE', help='record keyboard input to FILE')
+    parser.add_argument('--replay', metavar='FILE', help='replay input recorded in FILE')
+    parser.add_argument('--seed', type=seed_argument, help='random seed for a recorded run')
+
+
+def setup_controls(args):
+    if args.replay:
+        controls.replay(args.replay)
+    elif args.record:
+        controls.record(args.record, args.seed)
+    elif args.seed is not None:
+        controls.seed = args.seed
 
+
+def add_profiler_arguments(parser):
+    """Аргументы командной строки профайлера кадров"""
+    parser.add_argument('--profile', action='store_true',
+                        help='show per-phase frame time percentiles on screen')
+    parser.add_argument('--profile-csv', metavar='FILE',
+                        help='write per-frame phase timings to FILE on exit')
+
+
+def add_render_arguments(parser):
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='redraw and update only the changed parts of the screen')
+
+
+def setup_renderer(args):
+    global renderer
+    if args.dirty_rects:
+        renderer = DirtyRenderer()
+
+
+def setup_profiler(args, overlay=True):
+    if args.profile or args.profile_csv:
+        profiler.enable(overlay=overlay and args.profile, csv_path=args.profile_csv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Super Marivo')
+    add_controls_arguments(parser)
+    add_profiler_arguments(parser)
+    add_render_arguments(parser)
+    args = parser.parse_args()
+    setup_controls(args)
+    setup_profiler(args)
+    setup_renderer(args)
+
+    time = pygame.time.Clock()
+    start()
+
+    while True:
+        update()
         time.tick(FPS)
-        pygame.display.flip()
+        renderer.present()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
 from MapBase import MapBase
 import json
+import threading
+import LevelCompiler
+from LevelCompiler import LevelError
+from LevelPack import validate
 from Tile import *
 from Goomba import Goomba
 from Koopa import Koopa, JumpingKoopa
@@ -7,17 +11,21 @@ from collections import defaultdict
 
 player_type = 'normal'  # Тип игрока. может быть normal, fire
 player_state = 'small'  # состояние игрока. Может быть small, big
+# Уже разобранные уровни: имя -> (stamp файлов, уровень). Хранятся только текущий уровень, чтобы
+# перезапуск после смерти не читал диск, и следующий, если его уже подготовил preload
+levels = {}
+preloads = {}  # Имя уровня -> поток, готовящий его в фоне, см. preload
 
 
 def load_json(name):
-    """Метод безопасной загрузки и преобразования json-файла"""
+    """Метод безопасной загрузки и преобразования json-файла. Бросает LevelError, если уровень
+    не удалось прочитать"""
     fullname = os.path.join('data', 'levels', name + '.json')
     try:
         with open(fullname, encoding='utf8') as file:
             lvl = defaultdict(list, json.loads(file.read()))
-    except Exception as message:
-        print('Cannot load level:', fullname)
-        raise SystemExit(message)
+    except (OSError, ValueError) as message:
+        raise LevelError('%s: %s' % (fullname, message))
     # Ключи в словарях в json не могут быть int и float, поэтому приходится приводить тип
     for key in lvl:
         if type(lvl[key]) is dict:
@@ -27,21 +35,83 @@ def load_json(name):
     return lvl
 
 
+def load(name):
+    """Загрузка уровня. Скомпилированный LevelCompiler уровень берется вместо json, если он
+    не старше json. Испорченный или старый скомпилированный файл пропускается. Уровень
+    проверяется целиком, поэтому если он неправильный, LevelError бросается здесь, а не
+    посреди построения карты"""
+    source = os.path.join('data', 'levels', name + '.json')
+    compiled = LevelCompiler.compiled_path(name)
+    level = None
+    try:
+        if os.path.getmtime(compiled) >= os.path.getmtime(source):
+            level = LevelCompiler.load_compiled(compiled)
+    except FileNotFoundError:
+        pass
+    except (OSError, LevelError) as message:
+        print('Cannot load compiled level:', message)
+    if level is None:
+        level = load_json(name)
+    validate(level)
+    return level
+
+
+def stamp(name):
+    """Времена изменения json и скомпилированного файла уровня. Если они изменились, уровень
+    читается с диска заново"""
+    times = []
+    for path in os.path.join('data', 'levels', name + '.json'), LevelCompiler.compiled_path(name):
+        try:
+            times.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            times.append(None)
+    return tuple(times)
+
+
+def preload(name):
+    """Запускает чтение и разбор уровня в фоновом потоке, чтобы load_level не ждал диска.
+    Повторные вызовы ничего не делают"""
+    if name not in levels and name not in preloads:
+        preloads[name] = threading.Thread(target=prepare, args=(name,), daemon=True)
+        preloads[name].start()
+
+
+def prepare(name):
+    """Работа фонового потока preload. Поток только читает и разбирает файл: ассеты, их
+    дисковый кэш, спрайты и группы трогает только главный поток. Если что-то пошло не так,
+    load_level загрузит уровень сам и покажет ошибку"""
+    try:
+        levels[name] = stamp(name), load(name)  # stamp раньше чтения, см. load_level
+    except LevelError:
+        pass
+
+
 def load_level(lvl, utils, resetscore=False):
     """Функция, удаляющая все старые и создающая новые спрайты на экране,
-    т.е. загружающая уровень"""
+    т.е. загружающая уровень. Если уровень не удалось прочитать или он неправильный, бросает
+    LevelError до того, как что-то удалено, и текущий уровень остается на экране"""
     global cur, map, player
+    if lvl in preloads:
+        preloads.pop(lvl).join()  # Обычно поток давно закончил, пока шел подсчет очков
+    current = stamp(lvl)  # Снимается до чтения, чтобы изменение во время чтения не потерялось
+    if lvl not in levels or levels[lvl][0] != current:
+        levels[lvl] = current, load(lvl)  # Загружаем скомпилированный уровень или json
+    level = levels[lvl][1]
+    for name in list(levels):  # Остальные уровни больше не нужны, следующий подготовит preload
+        if name != lvl:
+            del levels[name]
     cur = lvl
     utils.hud.reset(resetscore)  # Обнуляем hud перед загрузкой новой карты
     if resetscore:  # Обнуляем тип и состояние игрока, если нужно
         global player_state, player_type
         player_state, player_type = 'small', 'normal'
 
-    # Полностью очищаем экран
+    # Полностью очищаем экран и возвращаем камеру в начало уровня
+    utils.camera.reset()
     utils.all_sprites.empty()
     [group.empty() for group in utils.groups]
 
-    level = load_json(lvl)  # Загружаем и преобразуем json
+    utils.Palette.release_unused([level['world']])  # Изображения других миров больше не нужны
 
     # Создаем класс карты, наполняем экран новыми спрайтами
     map = MapBase(level['world'], *level["size"])
@@ -63,6 +133,7 @@ def load_level(lvl, utils, resetscore=False):
     map.add_bonus_brick(level["BonusBrick"])
     map.add_invisible_tile(level["InvincibleTile"])
     player = map.add_player(level["player"], player_state, player_type)
+    map.update(utils.camera)  # Создаем объекты первого экрана
     utils.hud.set_world(map.world_name)  # Не забываем про название уровня в hud
 
 
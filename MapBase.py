@@ -1,3 +1,5 @@
+import pygame
+from collections import defaultdict
 from Tile import *
 from Player import Player
 from Goomba import Goomba
@@ -5,13 +7,23 @@ from Tube import Tube
 from Koopa import Koopa, JumpingKoopa
 from Castle import Castle
 from FlagPole import FlagPole
+from Spawner import Spawner
+from Utilities import WIDTH, PPM
 
 
 class MapBase:
     """Класс карты. Занимается созданием отдельных видов спрайтов, хранит в себе самые
     важные объекты для удобного доступа из других модулей. Иными словами, занимается конвертацией
-    загруженного json в питоновские объекты"""
+    загруженного json в питоновские объекты. Большинство объектов не создается сразу, а
+    ставится в очередь spawner и появляется по мере приближения камеры.
+    Уровень делится на чанки по CHUNK столбцов. Пока камера далеко, от чанка хранятся только
+    записи его объектов в pending и блоки его статичных тайлов в solid, а пол вообще не
+    хранится: он строится по списку ям. Подходящий к камере чанк загружается: объекты ставятся
+    в очередь spawner, а статичные блоки сливаются в SolidSpan. Чанк, оставшийся позади камеры,
+    выгружается вместе с тайлами и поверхностями слоев. Камера назад не ездит, поэтому
+    выгруженные чанки больше не понадобятся. Память и работа за кадр не зависят от длины уровня"""
     RIGHT_ADD = 12
+    CHUNK = WIDTH // PPM  # Ширина чанка в столбцах, совпадает с шириной чанков StaticLayer
 
     def __init__(self, world_type, width, height):
         self.world_type = world_type
@@ -20,6 +32,66 @@ class MapBase:
         self.castle = None
         self.flagpole = None
         self.player = None
+        self.spawner = Spawner()
+        self.empty = set()  # Столбцы без пола
+        self.pending = defaultdict(list)  # Номер чанка -> объекты, еще не поставленные в spawner
+        self.added = 0  # Сколько объектов добавлено, задает порядок создания, см. defer
+        self.solid = defaultdict(set)  # Номер чанка -> блоки статичных тайлов и труб
+        self.spans = {}  # Номер загруженного чанка -> его SolidSpan
+        self.loaded = 0  # Номер первого незагруженного чанка
+        self.unloaded = 0  # Номер первого невыгруженного чанка
+
+    def update(self, camera):
+        """Загрузка чанков, до которых дошла очередь spawner, создание объектов, к которым
+        подошла камера, и выгрузка чанков позади камеры"""
+        # Чанк загружается тогда, когда его первый столбец может сработать в spawner
+        while self.loaded * WIDTH <= camera.x + WIDTH + self.spawner.distance:
+            self.load_chunk(self.loaded)
+            self.loaded += 1
+        self.spawner.update(camera.x + WIDTH)
+        # Выгружается чанк левее того, в котором левая граница экрана, чтобы враги и предметы у
+        # края экрана не лишились коллизий
+        while (self.unloaded + 2) * WIDTH <= camera.x:
+            self.unload_chunk(self.unloaded)
+            self.unloaded += 1
+
+    @staticmethod
+    def chunk_of(x):
+        """Номер чанка столбца x"""
+        return max(0, int(x - 1) // MapBase.CHUNK)
+
+    def defer(self, x, factory, *args, ahead=True):
+        """Откладывает объект до загрузки его чанка. Аргументы как у Spawner.add. Номер
+        добавления сохраняется, чтобы объекты из соседних чанков с одним x срабатывания
+        создавались в том же порядке, в каком были добавлены"""
+        self.added += 1
+        self.pending[self.chunk_of(x)].append((x, factory, args, ahead, self.added))
+
+    def load_chunk(self, index):
+        """Ставит объекты чанка в очередь spawner и создает коллизии его статичных блоков"""
+        solid = self.solid.pop(index, set())
+        first = index * MapBase.CHUNK + 1
+        for i in range(first, min(first + MapBase.CHUNK, self.width + MapBase.RIGHT_ADD + 1)):
+            if i not in self.empty:
+                # Пол раньше всего остального в том же столбце, как и раньше при загрузке
+                self.spawner.add(i, Floor, i, 13, self.world_type, order=0)
+                self.spawner.add(i, Floor, i, 14, self.world_type, order=0)
+                solid.update([(i, 13), (i, 14)])
+        for x, factory, args, ahead, order in self.pending.pop(index, []):
+            self.spawner.add(x, factory, *args, ahead=ahead, order=order)
+        self.spans[index] = [SolidSpan(pygame.Rect((x - 1) * PPM, y * PPM, w * PPM, h * PPM))
+                             for x, y, w, h in self.merge_cells(solid)]
+
+    def unload_chunk(self, index):
+        """Убирает коллизии, тайлы и поверхности слоев чанка"""
+        for span in self.spans.pop(index, []):
+            tiles_group.remove_static(span)
+        right = (index + 1) * WIDTH
+        for tile in tiles_group.sprites():
+            if tile.rect.right <= right:
+                tile.kill()
+        decor_layer.release(index)
+        tiles_layer.release(index)
 
     def add_castle(self, x, y, is_big):
         self.castle = Castle(x, y, is_big)
@@ -30,72 +102,99 @@ class MapBase:
     def add_goombas(self, goombas):
         for y in goombas:
             for x in goombas[y]:
-                Goomba(x, y, self.world_type)
+                self.defer(x, Goomba, x, y, self.world_type, ahead=False)
 
     def add_koopas(self, koopas):
         for y in koopas:
             for x in koopas[y]:
-                Koopa(x, y, self.world_type)
+                self.defer(x, Koopa, x, y, self.world_type, ahead=False)
 
     def add_jkoopas(self, jkoopas):
         for y in jkoopas:
             for x in jkoopas[y]:
-                JumpingKoopa(x, y, self.world_type)
+                self.defer(x, JumpingKoopa, x, y, self.world_type, ahead=False)
 
     def add_quests(self, quests, sizeup=[], liveup=[], star=[], flower=[]):
+        items = {}  # (x, y) -> предмет. При повторах выигрывает первый список, как раньше
+        for item, cells in (('MushroomSizeUp', sizeup), ('MushroomLiveUp', liveup),
+                            ('Star', star), ('FireFlower', flower)):
+            for x, y in cells:
+                items.setdefault((x, y), item)
         for y in quests:
             for x in quests[y]:
-                quest = 'Coin'
-                if [x, y] in sizeup:
-                    quest = 'MushroomSizeUp'
-                elif [x, y] in liveup:
-                    quest = 'MushroomLiveUp'
-                elif [x, y] in star:
-                    quest = 'Star'
-                elif [x, y] in flower:
-                    quest = 'FireFlower'
-                Quest(x, y, self.world_type, quest)
+                self.defer(x, Quest, x, y, self.world_type, items.get((x, y), 'Coin'))
 
     def add_tiles(self, tile_class, tiles):
         for y in tiles:
             for x in tiles[y]:
-                tile_class(x, y, self.world_type)
+                self.defer(x, tile_class, x, y, self.world_type)
+                if tile_class.static:
+                    self.solid[self.chunk_of(x)].add((x, y))
 
     def add_bonus_brick(self, tiles):
         for x, y, bonus in tiles:
-            Brick(x, y, self.world_type, bonus)
+            self.defer(x, Brick, x, y, self.world_type, bonus)
 
     def add_enemies(self, enemy_class, enemies):
         for y in enemies:
             for x in enemies[y]:
-                enemy_class(x, y, self.world_type)
+                self.defer(x, enemy_class, x, y, self.world_type, ahead=False)
 
     def add_floor(self, empty):
-        for i in range(1, self.width + MapBase.RIGHT_ADD + 1):
-            if i in empty:
-                continue
-            Floor(i, 13, self.world_type)
-            Floor(i, 14, self.world_type)
+        """Сам пол строится в load_chunk, здесь запоминаются только столбцы без него"""
+        self.empty = set(empty)
 
     def add_tubes(self, tubes):
         for y in tubes:
             for x, pow in tubes[y]:
-                Tube(x, y, pow)
+                self.defer(x, Tube, x, y, pow)
+                for cell in Tube.cells(x, y, pow):
+                    self.solid[self.chunk_of(cell[0])].add(cell)
 
     def add_decor(self, grass_hills=[], grass=[], clouds=[]):
         for y in grass_hills:
             for x, h in grass_hills[y]:
-                GrassHill(x, y, h)
+                self.defer(x, GrassHill, x, y, h)
         for y in grass:
             for x in grass[y]:
-                Grass(x, y)
+                self.defer(x, Grass, x, y)
         for y in clouds:
             for x in clouds[y]:
-                Cloud(x, y)
+                self.defer(x, Cloud, x, y)
 
     def add_invisible_tile(self, tiles):
         for x, y, bonus in tiles:
-            InvincibleTile(x, y, self.world_type, bonus)
+            self.defer(x, InvincibleTile, x, y, self.world_type, bonus)
+
+    @staticmethod
+    def merge_cells(cells):
+        """Покрывает множество блоков прямоугольниками (x, y, ширина, высота): сначала блоки
+        каждой строки сливаются в отрезки, затем одинаковые отрезки соседних строк - в один
+        прямоугольник. Лестница или пол с ямами дают несколько прямоугольников вместо сотен
+        блоков"""
+        rows = defaultdict(list)
+        for x, y in cells:
+            rows[y].append(x)
+        spans = []
+        open_spans = {}  # (начало, конец отрезка) -> индекс прямоугольника, дошедшего до строки
+        for y in sorted(rows):
+            runs = []
+            for x in sorted(rows[y]):
+                if runs and runs[-1][1] + 1 == x:
+                    runs[-1][1] = x
+                else:
+                    runs.append([x, x])
+            next_open = {}
+            for start, end in runs:
+                index = open_spans.get((start, end))
+                if index is not None and spans[index][1] + spans[index][3] == y:
+                    spans[index][3] += 1
+                else:
+                    index = len(spans)
+                    spans.append([start, y, end - start + 1, 1])
+                next_open[start, end] = index
+            open_spans = next_open
+        return spans
 
     def add_world_name(self, world_name):
         """Сохраняет название мира для hud"""
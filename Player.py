@@ -11,15 +11,23 @@ import Map
 class Player(BaseCharacter):
     """Собственно, сам Марио. Имеет множество состояний, анимаций, инерцию, занимается проверками на
     столкновения с врагами, блоками, замком"""
+    # Строки листов Марио: по одной на каждый тип и палитру мира
+    TYPES = ['normal', 'fire', 'luigi', 'star_1', 'star_2', 'star_3', 'underground_1',
+             'underground_2', 'castle', 'underwater_1', 'underwater_2']
+
+    # Изображения каждого типа загружаются при первом обращении и не зависят от мира уровня
+    IMAGES = Palette('Mario', lambda type: {
+        'small': cut_row('Mario.png', 14, 11, Player.TYPES.index(type)),
+        'big': cut_row('Big_Mario.png', 19, 11, Player.TYPES.index(type))}, per_world=False)
 
     def __init__(self, x, y, state, type, world):
         self.world = world  # Используется при откате типа игрока
         self.type = type  # Тип игрока. может быть normal, fire, luigi...
         self.state = state  # состояние игрока. Может быть small, big
-        self.MARIO_IMAGES = self.load_images()  # Константа хранит все изображения Марио
 
         # Прозрачный пиксель. Используется в режиме мерцания
-        self.alpha_surface = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.alpha_surface = get_asset('alpha_pixel',
+                                       lambda: pygame.Surface((1, 1), pygame.SRCALPHA))
         self.load_frames()
         self.max_vx = 5  # Максимальная горизонтальная скорость в пикселях на кадр
         super().__init__(x, y, players_group)
@@ -40,34 +48,24 @@ class Player(BaseCharacter):
         self.flagpoled = -1  # Положение Марио относительно флагштока
         self.end_speed = 4  # Горизонтальная скорость прогулки Марио от флагштока к замку
 
-    def load_images(self):
-        """Метод загрузки всех изображений и распределения их по категориям"""
-        images = {}
-        for name, s_surf, b_surf in zip(['normal', 'fire', 'luigi', 'star_1', 'star_2', 'star_3',
-                                         'underground_1', 'underground_2', 'castle',
-                                         'underwater_1', 'underwater_2'],
-                                        cut_sheet(load_image('Mario.png'), 14, 11),
-                                        cut_sheet(load_image('Big_Mario.png'), 19, 11)):
-            images[name] = {'small': s_surf, 'big': b_surf}
-        return images
-
     def load_frames(self):
         """Загрузка кадров для данного состояния и типа Марио и создание зеркальных кадров для
         другого направления"""
         self.cur_frame = 0  # Счетчик кадров
-        self.frames = self.MARIO_IMAGES[self.type][self.state]
-        self.l_frames = [pygame.transform.flip(frame, True, False) for frame in self.frames]
+        self.frames = Player.IMAGES[self.type][self.state]
+        self.l_frames = get_asset(('mario_left', self.type, self.state),
+                                  lambda: flip_frames(self.frames))
         self.r_frames = self.frames
         self.image = self.frames[self.cur_frame]
 
     def update_frames(self):
         """Метод позволяет переключаться на разные по высоте изображения Марио без изменения его
-        положения, пересоздает коллизии"""
+        положения, сдвигает коллизии под новый размер"""
         bottomleft = self.rect.bottomleft
         self.load_frames()
         self.rect = self.image.get_rect()
         self.rect.bottomleft = bottomleft
-        self.create_sides()
+        self.update_sides()
 
     def update(self):
         if self.rect.y > HEIGHT * 2:
@@ -93,8 +91,6 @@ class Player(BaseCharacter):
 
         self.update_blincking()  # Анимация мерцания
 
-        self.sides_group.draw(screen)  # Отрисовка коллизий
-
     def update_flagpoled(self):
         """Анимации в конце уровня"""
         if self.flagpoled == 1:  # Прогулка от флажка до замка
@@ -123,44 +119,27 @@ class Player(BaseCharacter):
                 self.image = self.alpha_surface
 
     def check_tile_collisions(self):
-        """Тут нет копипаста, новые координаты присваиваются для разных сторон по-разному,
-        действия при столкновении тоже разные"""
-        self.update_sides()  # Обновляем коллизии, т.к. с момента прошлого вызова метода положение
-        # Марио, скорее всего, поменялось.
-        colided_tile = pygame.sprite.spritecollideany(self.left_side, tiles_group)
-        if colided_tile:
-            # т.к. проверки на столконвения происходят ограниченное кол-во раз в секунду, то между
-            # ними Марио может слегка вылететь за текстуры, строка ниже возвращает его назад
-            self.rect.x = colided_tile.rect.right
-            self.vx = max(0, self.vx)  # При столкновении слева больше нельзя налево
-            self.update_sides()  # Обновляем коллизии после изменения положения объекта
-
-        colided_tile = pygame.sprite.spritecollideany(self.right_side, tiles_group)
-        if colided_tile:
-            self.rect.right = colided_tile.rect.x  # Возвращаем Марио на границу с тайлом
-            self.vx = min(0, self.vx)  # При столкновении справа больше нельзя направо
-            self.update_sides()  # Обновляем коллизии после изменения положения объекта
-
-        colided_tile = pygame.sprite.spritecollideany(self.down_side, tiles_group)
-        if colided_tile:
-            self.rect.bottom = colided_tile.rect.y  # Возвращаем Марио на границу с тайлом
-            self.vy = min(0, self.vy)  # При столкновении снизу больше нельзя вниз
-            self.update_sides()  # Обновляем коллизии после изменения положения объекта
-            self.cur_jump = 0  # Если Марио стоит на чем-то, то может заново прыгнуть
-            self.killing_rate = 1  # Марио стоит на тайле, а не на враге. Комбо сбрасывается
-        else:
+        """Тут нет копипаста, действия при столкновении с разными сторонами разные. Положение
+        Марио уже исправлено в sweep_tiles, остается только обработать касания"""
+        on_floor = False
+        for (nx, ny), colided_tile in self.sweep_tiles():
+            if nx > 0:
+                self.vx = max(0, self.vx)  # При столкновении слева больше нельзя налево
+            elif nx < 0:
+                self.vx = min(0, self.vx)  # При столкновении справа больше нельзя направо
+            elif ny < 0:
+                on_floor = True
+                self.vy = min(0, self.vy)  # При столкновении снизу больше нельзя вниз
+                self.cur_jump = 0  # Если Марио стоит на чем-то, то может заново прыгнуть
+                self.killing_rate = 1  # Марио стоит на тайле, а не на враге. Комбо сбрасывается
+            else:
+                self.cur_jump = self.max_jumps  # Нельзя прыгтнуть выше, если вверху что-то есть.
+                if self.vy < 0:  # Удар головой об блок активирует его
+                    colided_tile.interact(self.state)
+                self.vy = max(0, self.vy)  # При столкновении сверху больше нельзя вверх
+        if not on_floor:
             self.image = self.frames[4]  # если Марио не стоит на чем-то, ставим картинку летящего
 
-        colided_tile = pygame.sprite.spritecollideany(self.top_side, tiles_group)
-        if colided_tile:
-            self.cur_jump = self.max_jumps  # Нельзя прыгтнуть выше, если вверху что-то есть.
-            if self.vy < 0:  # Удар головой об блок активирует его
-                colided_tile.interact(self.state)
-
-            self.rect.y = colided_tile.rect.bottom  # Возвращаем Марио на границу с тайлом
-            self.vy = max(0, self.vy)  # При столкновении сверху больше нельзя вверх
-            self.update_sides()  # Обновляем коллизии после изменения положения объекта
-
     def check_enemies_collisions(self):
         self.update_sides()  # Обновляем коллизии, т.к. с момента прошлого вызова метода положение
         # Марио, скорее всего, поменялось.
@@ -171,7 +150,7 @@ class Player(BaseCharacter):
 
         # Если враг задел боковую сторону...
         for side in [self.left_side, self.right_side]:
-            colided_enemy = pygame.sprite.spritecollideany(side, enemies_group)
+            colided_enemy = rect_collideany(side, enemies_group)
             if colided_enemy:
                 # ...уменьшаемся и становимся неуязвимыми на 120 кадров...
                 if self.set_state('small', self.world):
@@ -180,7 +159,7 @@ class Player(BaseCharacter):
                     self.die()  # ... или умираем
                 return
 
-        colided_enemies = pygame.sprite.spritecollide(self.down_side, enemies_group, False)
+        colided_enemies = rect_collide(self.down_side, enemies_group)
         if colided_enemies and self.vy > 0:
             # При приземлении на голову врага
             self.rect.bottom = colided_enemies[0].rect.y  # Возвращаем Марио на границу с врагом
@@ -199,7 +178,7 @@ class Player(BaseCharacter):
         self.update_sides()
         if self.flagpoled > -1:
             return
-        colided_flagpole = pygame.sprite.spritecollideany(self.right_side, castle_group)
+        colided_flagpole = rect_collideany(self.right_side, castle_group)
         if colided_flagpole and self.rect.x + self.rect.w > colided_flagpole.rect.x + PPM // 4:
             if isinstance(colided_flagpole, FlagPole):
                 colided_flagpole.start()
@@ -242,38 +221,34 @@ class Player(BaseCharacter):
     def walking(self):
         self.image = self.frames[self.cur_frame * abs(self.max_vx) // 50 % 3]
 
-    def process_events(self, events_list):
-        """Обработка клавиш и ивентов"""
+    def process_events(self, controls):
+        """Обработка клавиш и ивентов. controls - снимок ввода за кадр (Controls.InputFrame)"""
         any_key_pressed = False
 
-        for event in events_list:
-            if event.type == pygame.QUIT:
-                terminate()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP and pygame.sprite.spritecollideany(self.down_side,
-                                                                               tiles_group):
-                    self.jump()
-                    any_key_pressed = True
-
-                elif event.key == pygame.K_x and self.type == 'fire':
-                    Fire(self.rect.centerx / PPM + 1, self.rect.centery / PPM,
-                         1 if self.frames is self.r_frames else -1)
+        if controls.quit:
+            terminate()
+        if controls.keydown(pygame.K_UP) and tiles_group.collide(self.down_side):
+            self.jump()
+            any_key_pressed = True
+        if controls.keydown(pygame.K_x) and self.type == 'fire':
+            Fire(self.rect.centerx / PPM + 1, self.rect.centery / PPM,
+                 1 if self.frames is self.r_frames else -1)
 
         if self.died or self.flagpoled >= 0:
             # Игнорируем нажатые клавиши после смерти или пересечения флажка
             return
 
-        self.max_vx = 10 if pygame.key.get_pressed()[pygame.K_LSHIFT] else 5
+        self.max_vx = 10 if controls.held(pygame.K_LSHIFT) else 5
 
         if self.cur_jump and not any_key_pressed:
-            if pygame.key.get_pressed()[pygame.K_UP]:
+            if controls.held(pygame.K_UP):
                 self.jump()
                 any_key_pressed = True
             else:
                 self.cur_jump = self.max_jumps  # Предотвращение "двойного прыжка"
 
         for key, func in [(pygame.K_RIGHT, self.right), (pygame.K_LEFT, self.left)]:
-            if pygame.key.get_pressed()[key]:
+            if controls.held(key):
                 func()
                 any_key_pressed = True
 
@@ -287,14 +262,11 @@ class Player(BaseCharacter):
 
     def create_top_side(self):
         """Верхняя коллизия не должна быть слишком широкой, иначе сложно активировать нужный тайл"""
-        self.top_side = pygame.sprite.Sprite(self.sides_group)
-        self.top_side.image = pygame.Surface((self.rect.w // 2, 1))
-        self.top_side.image.fill((0, 255, 0))
+        return pygame.Rect(0, 0, 0, 0)
 
     def update_top_side(self):
         """Верхняя коллизия не должна быть слишком широкой, иначе сложно активировать нужный тайл"""
-        self.top_side.rect = pygame.Rect(self.rect.x + self.rect.w // 4, self.rect.y,
-                                         self.rect.w // 2, 1)
+        self.top_side.update(self.rect.x + self.rect.w // 4, self.rect.y, self.rect.w // 2, 1)
 
     def set_state(self, new_state, new_type=None):
         """Смена состояний и обновление изображений Марио, включение мерциния"""
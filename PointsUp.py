@@ -2,16 +2,18 @@ import pygame
 from Utilities import *
 
 
-class PointsUp(pygame.sprite.Sprite):
+class PointsUp(Pooled, pygame.sprite.Sprite):
     """Класс вылетающих на экране очков"""
     SIZE = 20
     pygame.font.init()
     FONT = load_font("SuperMario256.ttf", SIZE)
+    GLYPHS = GlyphAtlas(FONT)
     TIMER_LIM = 20  # Время существования в кадрах
 
     def __init__(self, x, y, points):
         super().__init__(all_sprites, particles_group)
-        self.image = PointsUp.FONT.render(str(int(points)), 1, pygame.Color('white'))
+        self.image = get_asset(('points', int(points)),
+                               lambda: PointsUp.GLYPHS.render(str(int(points))))
         self.rect = self.image.get_rect()
         self.rect = self.rect.move(x, y)
         self.timer = 0
@@ -19,5 +21,6 @@ class PointsUp(pygame.sprite.Sprite):
     def update(self):
         self.timer += 1
         if self.timer == PointsUp.TIMER_LIM:
-            self.kill()
+            self.kill()  # Объект уже в пуле, поэтому дальше его трогать нельзя
+            return
         self.rect.y -= 1
@@ -0,0 +1,114 @@
+import atexit
+import csv
+import time
+from collections import deque
+import pygame
+from Utilities import load_font, FPS
+
+# Фазы кадра в порядке выполнения в Main.update
+PHASES = ['input', 'camera', 'players', 'sprites', 'draw', 'hud']
+PERCENTILES = [50, 95, 99]
+
+
+class FrameProfiler:
+    """Замеряет время каждой фазы кадра через perf_counter_ns. Хранит скользящее окно последних
+    кадров для перцентилей, может рисовать их поверх игры и сохранять все кадры в CSV при выходе.
+    Пока профайлер выключен, mark ничего не делает, поэтому его можно не убирать из Main.update"""
+    WINDOW = FPS * 10  # Сколько последних кадров учитывается в перцентилях
+    REFRESH = FPS // 2  # Как часто перерисовывается оверлей, в кадрах
+
+    def __init__(self):
+        self.enabled = False
+        self.overlay = False  # Рисовать ли перцентили на экране
+        self.csv_path = None  # Файл, в который при выходе сохраняются замеры всех кадров
+        self.level = ''  # Текущий уровень, пишется в CSV, чтобы сравнивать уровни между собой
+        self.window = [deque(maxlen=self.WINDOW) for _ in PHASES + ['total']]
+        self.rows = []  # Замеры всех кадров для CSV
+        self.frame = 0  # Номер кадра с начала игры
+        self.current = [0] * len(PHASES)  # Замеры текущего кадра в наносекундах
+        self.last = 0  # Время последней отметки
+        self.font = None
+        self.overlay_surf = None
+
+    def enable(self, overlay=False, csv_path=None):
+        self.enabled = True
+        self.overlay = overlay
+        if csv_path:
+            self.csv_path = csv_path
+            atexit.register(self.save)
+        if overlay:
+            self.font = load_font("SuperMario256.ttf", 20)
+
+    def begin(self):
+        """Начало кадра. Кадр, не дошедший до end (например, во время заставки game over),
+        просто не попадает в статистику"""
+        if self.enabled:
+            self.current = [0] * len(PHASES)
+            self.last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        """Приписывает фазе phase время, прошедшее с предыдущей отметки"""
+        if self.enabled:
+            now = time.perf_counter_ns()
+            self.current[PHASES.index(phase)] += now - self.last
+            self.last = now
+
+    def end(self):
+        if not self.enabled:
+            return
+        row = self.current + [sum(self.current)]
+        for window, value in zip(self.window, row):
+            window.append(value)
+        if self.csv_path:
+            self.rows.append([self.frame, self.level] + row)
+        self.frame += 1
+        if self.overlay and self.frame % self.REFRESH == 1:
+            self.overlay_surf = None  # Оверлей перерисуется при следующем draw
+
+    def percentiles(self, phase):
+        """Перцентили PERCENTILES времени фазы phase ('total' - всего кадра) в миллисекундах"""
+        values = sorted(self.window[(PHASES + ['total']).index(phase)])
+        if not values:
+            return [0.0] * len(PERCENTILES)
+        return [values[min(len(values) - 1, len(values) * p // 100)] / 1e6
+                for p in PERCENTILES]
+
+    def table(self):
+        """Таблица перцентилей всех фаз: строка заголовка и по строке на фазу"""
+        rows = [['ms'] + ['p%d' % p for p in PERCENTILES]]
+        for phase in PHASES + ['total']:
+            rows.append([phase] + ['%.3f' % value for value in self.percentiles(phase)])
+        return rows
+
+    def report(self):
+        """Таблица перцентилей в виде строк текста"""
+        return ['%-8s' % row[0] + ''.join('%8s' % cell for cell in row[1:])
+                for row in self.table()]
+
+    def draw(self, screen, y):
+        """Рисует таблицу перцентилей в левом верхнем углу экрана, начиная с высоты y"""
+        if not (self.enabled and self.overlay):
+            return
+        if self.overlay_surf is None:
+            rows = [[self.font.render(cell, 1, pygame.Color('White')) for cell in row]
+                    for row in self.table()]
+            step = self.font.get_linesize()
+            # Шрифт не моноширинный, поэтому ячейки выравниваются по самой широкой в столбце
+            widths = [max(row[i].get_width() for row in rows) + 15 for i in range(len(rows[0]))]
+            self.overlay_surf = pygame.Surface((sum(widths), step * len(rows) + 10))
+            self.overlay_surf.set_alpha(160)
+            for i, row in enumerate(rows):
+                x = 5
+                for cell, width in zip(row, widths):
+                    # Название фазы прижимается влево, числа - вправо
+                    shift = 0 if x == 5 else width - 15 - cell.get_width()
+                    self.overlay_surf.blit(cell, (x + shift, 5 + step * i))
+                    x += width
+        screen.blit(self.overlay_surf, (10, y))
+
+    def save(self):
+        with open(self.csv_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'level'] + [phase + '_ns' for phase in PHASES] +
+                            ['total_ns'])
+            writer.writerows(self.rows)
@@ -0,0 +1,111 @@
+import pygame
+from Utilities import camera, debug, groups, hud
+
+SKY = (92, 148, 252)  # Цвет фона
+
+
+class FullRenderer:
+    """Обычная отрисовка: каждый кадр экран заливается фоном, все группы рисуются заново,
+    и на дисплей выводится весь экран"""
+
+    def draw(self, screen, overlay=False):
+        screen.fill(SKY)
+        [camera.draw(group, screen) for group in groups]  # отрисовка групп в нужном порядке
+        debug.draw(screen)  # коллизии и сетка тайлов, если включена отладка
+
+    def present(self):
+        pygame.display.flip()
+
+
+class ScreenSprite(pygame.sprite.DirtySprite):
+    """Экранная копия видимого спрайта для DirtyRenderer. Спрайты игры живут в мировых
+    координатах, а LayeredDirty работает в экранных, поэтому копия каждый кадр переносит
+    картинку и положение спрайта со сдвигом камеры и помечается грязной, только если они
+    изменились"""
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+        self.image = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    def sync(self):
+        image = self.source.image
+        x, y = self.source.rect.x - camera.x, self.source.rect.y
+        if image is not self.image or x != self.rect.x or y != self.rect.y:
+            self.image = image
+            self.rect = image.get_rect(x=x, y=y)  # Новый rect: старый LayeredDirty стирает сам
+            self.dirty = 1
+
+
+class DirtyRenderer:
+    """Отрисовка только изменившихся участков экрана. Видимые спрайты всех групп из groups
+    собираются в одну LayeredDirty, слой спрайта - номер его группы, поэтому порядок отрисовки
+    тот же. На дисплей выводятся только перерисованные прямоугольники.
+    Когда камера сдвинулась, меняется весь экран, поэтому он перерисовывается целиком, как и
+    при отладочной отрисовке, оверлее профайлера и заставке game over, которые рисуются поверх"""
+
+    def __init__(self):
+        self.layers = pygame.sprite.LayeredDirty()
+        self.background = None
+        self.proxies = {}  # Спрайт игры -> его ScreenSprite
+        self.shown = {}  # Номер слоя -> ScreenSprite слоя в порядке отрисовки
+        self.rects = []  # Прямоугольники, перерисованные в последнем кадре
+        self.repaint = True  # Перерисовать весь экран в следующем кадре
+
+    def sync(self):
+        """Обновление экранных копий: новые видимые спрайты добавляются, а ушедшие с экрана и
+        удаленные из групп убираются. LayeredDirty сам закрашивает фоном место убранных"""
+        for layer, group in enumerate(groups):
+            shown = []  # Копии видимых спрайтов группы в порядке ее обхода
+            for sprite in group:
+                if camera.is_visible(sprite.rect):
+                    if sprite not in self.proxies:
+                        self.proxies[sprite] = ScreenSprite(sprite)
+                    self.proxies[sprite].sync()
+                    shown.append(self.proxies[sprite])
+            if shown != self.shown.get(layer, []):
+                self.order(layer, shown)
+
+    def order(self, layer, shown):
+        """Приводит слой layer к списку shown. Внутри слоя спрайты рисуются в порядке
+        добавления, а FullRenderer рисует их в порядке обхода группы. Новые спрайты обычно идут
+        в конце группы и просто добавляются в слой. Иначе слой собирается заново в порядке
+        группы и перерисовывается"""
+        previous = self.shown.get(layer, [])
+        current = set(shown)
+        for proxy in previous:
+            if proxy not in current:
+                del self.proxies[proxy.source]
+                proxy.kill()
+        kept = [proxy for proxy in previous if proxy in current]
+        if shown[:len(kept)] == kept:
+            self.layers.add(*shown[len(kept):], layer=layer)
+        else:
+            self.layers.remove(*kept)
+            self.layers.add(*shown, layer=layer)
+            for proxy in shown:
+                proxy.dirty = 1
+        self.shown[layer] = shown
+
+    def draw(self, screen, overlay=False):
+        """overlay - поверх кадра будет нарисовано что-то еще, например оверлей профайлера"""
+        if self.background is None:
+            self.background = pygame.Surface(screen.get_size()).convert()
+            self.background.fill(SKY)
+            self.layers.clear(screen, self.background)
+        self.sync()
+
+        overlay = overlay or debug.enabled or hud.get_game_over()
+        if self.repaint or camera.dx or overlay:
+            self.layers.repaint_rect(screen.get_rect())
+        # Худ рисуется поверх каждый кадр, поэтому под ним всегда восстанавливается фон
+        self.layers.repaint_rect(pygame.Rect(0, 0, screen.get_width(), hud.get_height()))
+        # Кадр после оверлея тоже полный, чтобы стереть сам оверлей
+        self.repaint = overlay
+
+        self.rects = self.layers.draw(screen)
+        debug.draw(screen)
+
+    def present(self):
+        pygame.display.update(self.rects)
@@ -0,0 +1,41 @@
+from Utilities import PPM, WIDTH
+
+
+class Spawner:
+    """Очередь создания объектов уровня, отсортированная по столбцу. Объекты создаются только
+    тогда, когда камера подходит к ним на заданное расстояние, поэтому загрузка уровня не зависит
+    от его длины, а число живых спрайтов - только от размера экрана"""
+    DISTANCE = WIDTH  # На сколько пикселей правее экрана создаются блоки и декорации
+
+    def __init__(self, distance=DISTANCE):
+        self.distance = distance
+        self.queue = []  # Элементы вида (x срабатывания в пикселях, порядок, фабрика, аргументы)
+        self.cursor = 0  # Индекс первого еще не созданного объекта
+        self.sorted = True
+
+    def add(self, x, factory, *args, ahead=True, order=0):
+        """x - столбец объекта в блоках. Объекты с ahead=True создаются заранее, за distance
+        пикселей до появления на экране. Враги создаются ровно в момент появления на экране:
+        тогда же они и начинали двигаться, пока были созданы заранее.
+        Из объектов с одним x срабатывания первым создается объект с меньшим order, а при
+        равных order - добавленный раньше"""
+        trigger = (x - 1) * PPM - (self.distance if ahead else 0)
+        self.queue.append((trigger, order, factory, args))
+        self.sorted = False
+
+    def update(self, right):
+        """Создает все объекты, до которых дошла правая граница экрана right"""
+        if not self.sorted:
+            # Сортировка устойчива, поэтому объекты одного столбца создаются в порядке добавления.
+            # Созданные объекты заодно выбрасываются, чтобы очередь не росла по ходу уровня
+            self.queue = sorted(self.queue[self.cursor:], key=lambda item: item[:2])
+            self.cursor = 0
+            self.sorted = True
+        while self.cursor < len(self.queue) and self.queue[self.cursor][0] <= right:
+            trigger, order, factory, args = self.queue[self.cursor]
+            factory(*args)
+            self.cursor += 1
+
+    def __len__(self):
+        """Количество еще не созданных объектов"""
+        return len(self.queue) - self.cursor
@@ -1,18 +1,18 @@
 import pygame
 from Utilities import *
 from Items import *
-import random
 
 
-class Particle(pygame.sprite.Sprite):
+class Particle(Pooled, pygame.sprite.Sprite):
     """Частицы, создающиеся при разрушении блоков. Имеют случайный угол повората."""
+    ANGLE_STEP = 5  # Углы поворота округляются до кратных, чтобы кадры можно было кэшировать
 
-    def __init__(self, pos, dx, dy, image):
-        """Частица создается на основе переданного изображения."""
+    def __init__(self, pos, dx, dy, world, index):
+        """Частица создается на основе кадра index блоков мира world."""
         super().__init__(all_sprites, particles_group)
-        self.image = pygame.transform.rotate(
-            pygame.transform.scale(image, (image.get_width() // 2, image.get_height() // 2)),
-            random.randint(30, 60))
+        angle = rng.randint(30, 60) // Particle.ANGLE_STEP * Particle.ANGLE_STEP
+        self.image = TilesBase.IMAGES.derived(world, ('particle', index, angle), lambda: (
+            pygame.transform.rotate(Particle.shrink(world, index), angle)))
 
         self.rect = self.image.get_rect()
 
@@ -20,6 +20,13 @@ class Particle(pygame.sprite.Sprite):
         self.rect.x, self.rect.y = pos
         self.gravity = GRAVITY  # Ускорений свободного падения
 
+    @staticmethod
+    def shrink(world, index):
+        """Уменьшенное вдвое изображение блока, из которого поворачиваются кадры частиц"""
+        image = TilesBase.IMAGES[world][index]
+        return TilesBase.IMAGES.derived(world, ('particle', index), lambda: (
+            pygame.transform.scale(image, (image.get_width() // 2, image.get_height() // 2))))
+
     def update(self):
         self.velocity[1] += self.gravity  # Свободное падение
         self.rect.x += self.velocity[0]
@@ -28,30 +35,65 @@ class Particle(pygame.sprite.Sprite):
             self.kill()
 
 
+class SolidSpan:
+    """Прямоугольник из соседних статичных блоков, слитых при загрузке уровня (см. MapBase).
+    Статичные блоки никогда не меняются и ни с чем не взаимодействуют, поэтому коллизии с ними
+    проверяются по нескольким таким прямоугольникам, а не по каждому блоку"""
+
+    def __init__(self, rect):
+        self.rect = rect
+        tiles_group.add_static(self)
+
+    def edge(self, name, probe):
+        """Край name того блока прямоугольника, который ближе всех к этому краю и пересекается с
+        probe. Выталкивать объект нужно из этого блока, как до слияния: иначе объект, который
+        уже стоит в блоке, например высокий враг на полу, переносится к краю всего
+        прямоугольника"""
+        if name == 'x':
+            return self.rect.x + max(probe.x - self.rect.x, 0) // PPM * PPM
+        if name == 'y':
+            return self.rect.y + max(probe.y - self.rect.y, 0) // PPM * PPM
+        if name == 'right':
+            return self.rect.right - max(self.rect.right - probe.right, 0) // PPM * PPM
+        return self.rect.bottom - max(self.rect.bottom - probe.bottom, 0) // PPM * PPM
+
+    def interact(self, mario_state):
+        pass
+
+
 class TilesBase(pygame.sprite.Sprite):
-    """Базовый класс для всех блоков. Предоставляет метод создания частиц, убийства врагов"""
+    """Базовый класс для всех блоков. Предоставляет метод создания частиц, убийства врагов.
+    Статичные блоки никогда не меняются, поэтому запекаются в tiles_layer при создании, а их
+    коллизии берет на себя SolidSpan"""
+    static = False
     ITEMS = {'MushroomSizeUp': MushroomSizeUp, 'MushroomLiveUp': MushroomLiveUp,
              'MushroomDeadly': MushroomDeadly, 'FireFlower': FireFlower, 'Star': Star, 'Coin': Coin}
 
-    # Загрузка всех изображений и распределение их на группы
-    IMAGES = {name: surf for name, surf in
-              zip(['normal', 'underground', 'castle', 'underwater'],
-                  cut_sheet(load_image("Tile.png"), 11, 4))}
+    # Изображения для каждого мира загружаются при первом обращении
+    IMAGES = Palette.sheet("Tile.png", 11, 4)
 
     def __init__(self, x, y):
-        super().__init__(all_sprites, tiles_group)
+        super().__init__()
         self.rect = self.image.get_rect()
         self.rect = self.rect.move((x - 1) * PPM, y * PPM)  # Перевод координат из блоков в пиксели
+        if self.static:
+            tiles_layer.bake(self)
+        else:
+            self.add(all_sprites, tiles_group)  # tiles_group индексирует тайлы по rect
+
+    def edge(self, name, probe):
+        """Край name блока, к которому выталкиваются объекты (см. SolidSpan.edge)"""
+        return getattr(self.rect, name)
 
     def interact(self, mario_state):
         pass
 
-    def create_particles(self):
-        """Создание 4 частиц при разрушении блока"""
-        Particle(self.rect.topleft, -5, 0, self.image)
-        Particle(self.rect.midtop, 5, 0, self.image)
-        Particle(self.rect.midleft, -5, 5, self.image)
-        Particle(self.rect.center, 5, 5, self.image)
+    def create_particles(self, world, index):
+        """Создание 4 частиц при разрушении блока. index - номер кадра блока в IMAGES[world]"""
+        Particle(self.rect.topleft, -5, 0, world, index)
+        Particle(self.rect.midtop, 5, 0, world, index)
+        Particle(self.rect.midleft, -5, 5, world, index)
+        Particle(self.rect.center, 5, 5, world, index)
 
     def kill_enemies(self):
         """Убиство врагов стоящих на активированном блоке"""
@@ -60,10 +102,12 @@ class TilesBase(pygame.sprite.Sprite):
 
     def check_enemy_collide(self, tile, enemy):
         """Проверка столконвения блока с нижней стороной врага"""
-        return pygame.sprite.collide_rect(tile, enemy.down_side)
+        return tile.rect.colliderect(enemy.down_side)
 
 
 class Floor(TilesBase):
+    static = True
+
     def __init__(self, x, y, world):
         self.image = TilesBase.IMAGES[world][0]
         super().__init__(x, y)
@@ -71,29 +115,36 @@ class Floor(TilesBase):
 
 class BrickPlain(TilesBase):
     def __init__(self, x, y, world):
+        self.world = world
         self.image = TilesBase.IMAGES[world][2]
         super().__init__(x, y)
 
     def interact(self, mario_state):
         """BrickPlain сразу же разрушается при взаимодействии"""
         self.kill_enemies()
-        self.create_particles()
+        self.create_particles(self.world, 2)
         self.kill()
 
 
 class CastleBlock(TilesBase):
+    static = True
+
     def __init__(self, x, y, world):
         self.image = TilesBase.IMAGES[world][3]
         super().__init__(x, y)
 
 
 class CubbleStone(TilesBase):
+    static = True
+
     def __init__(self, x, y, world):
         self.image = TilesBase.IMAGES[world][4]
         super().__init__(x, y)
 
 
 class PavingStone(TilesBase):
+    static = True
+
     def __init__(self, x, y, world):
         self.image = TilesBase.IMAGES[world][5]
         super().__init__(x, y)
@@ -110,7 +161,7 @@ class Brick(TilesBase):
         super().__init__(x, y)
 
         # Хранит рандомное количество монет или 1 любой другой item
-        self.items = ([item] if item else []) * (random.randint(5, 10) if item == 'Coin' else 1)
+        self.items = ([item] if item else []) * (rng.randint(5, 10) if item == 'Coin' else 1)
         self.moving = False
         self.start_y = self.rect.y  # Начальная точка движения блока при взаимодейтсвии
         self.end_y = self.start_y - 14  # Конечная точка движения блока при взаимодейтсвии
@@ -131,7 +182,8 @@ class Brick(TilesBase):
             elif mario_state == 'small':
                 self.moving = True
             else:
-                self.create_particles()  # Если блок пустой, то может быть уничтожен большим Марио
+                # Если блок пустой, то может быть уничтожен большим Марио
+                self.create_particles(self.world, 1)
                 self.kill()
 
     def update(self):
@@ -142,10 +194,12 @@ class Brick(TilesBase):
         if self.moving:
             if self.rect.y > self.end_y:
                 self.rect.y -= 3
+                tiles_group.reindex(self)
             else:
                 self.moving = False
         elif self.rect.y < self.start_y:
             self.rect.y += 3
+            tiles_group.reindex(self)
 
 
 class InvincibleTile(TilesBase):
@@ -171,14 +225,14 @@ class InvincibleTile(TilesBase):
         self.used = True
 
 
-class Quest(TilesBase):
+class Quest(Animated, TilesBase):
     """Блок со знаком вопроса. Хранит максимум 1 item. После создания бонуса превращается в Stone"""
 
     def __init__(self, x, y, world, item):
         self.world = world
         self.frames = TilesBase.IMAGES[world][6:10]
-        self.cur_frame = 0  # Счетчик кадров
-        self.image = self.frames[self.cur_frame]
+        # Мерцание: картинка меняется каждые 10 кадров, 4 кадр - использованный блок
+        self.animation = Animation.track(self.frames[:3], 10)
         super().__init__(x, y)
 
         self.item = item
@@ -187,12 +241,7 @@ class Quest(TilesBase):
         self.end_y = self.start_y - self.rect.h // 3  # Конечная точка движения блока
 
     def update(self):
-        if self.image is not self.frames[3]:
-            self.cur_frame = (self.cur_frame + 1) % 60  # Обновление счетчика кадров
-
-            # Изменение картинки каждые 10 кадров. Тем самым создается анимация мерцания
-            self.image = self.frames[self.cur_frame // 10 % 3]
-            self.move()
+        self.move()
 
     def interact(self, mario_state):
         self.kill_enemies()
@@ -210,26 +259,33 @@ class Quest(TilesBase):
         if self.moving:
             if self.rect.y > self.end_y:
                 self.rect.y -= 3
+                tiles_group.reindex(self)
             else:
                 self.moving = False
         elif self.rect.y < self.start_y:
             self.rect.y += 3
+            tiles_group.reindex(self)
             if self.rect.y == self.start_y:
                 self.image = self.frames[3]
 
 
 class Stone(TilesBase):
+    static = True
+
     def __init__(self, x, y, world):
         self.image = TilesBase.IMAGES[world][9]
         super().__init__(x, y)
 
 
 class Decor(pygame.sprite.Sprite):
+    """Декорации ни с чем не взаимодействуют, поэтому сразу запекаются в decor_layer"""
+
     def __init__(self, x, y, image):
-        super().__init__(all_sprites, decor_group)
+        super().__init__()
         self.image = image
         self.rect = self.image.get_rect()
         self.rect = self.rect.move((x - 1) * PPM, y * PPM)
+        decor_layer.bake(self)
 
 
 class GrassHill(Decor):
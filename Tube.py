@@ -3,25 +3,29 @@ from Utilities import *
 
 
 class TubePart(pygame.sprite.Sprite):
-    """Класс верхней части трубы и ее основания"""
+    """Класс верхней части трубы и ее основания. Трубы не меняются, поэтому только запекаются в
+    tiles_layer. Коллизии труб проверяет SolidSpan"""
     parts = {"Base": load_image("tube_base.png"), "Head": load_image("tube_head.png")}
 
-    def __init__(self, part):
-        super().__init__(all_sprites, tiles_group)
+    def __init__(self, part, x, y):
+        super().__init__()
 
         self.image = TubePart.parts[part]
         self.rect = self.image.get_rect()
-
-    def move(self, x, y):
         self.rect = self.rect.move((x - 1) * PPM, y * PPM)  # Перевод координат из блоков в пиксели
+        tiles_layer.bake(self)
 
 
 class Tube:
     """Главный класс, создающий из частей целую трубу по заданным координатам"""
+    WIDTH = TubePart.parts["Base"].get_width() // PPM  # Ширина трубы в блоках
 
     def __init__(self, x, y, pow):
         for i in range(pow - 1):
-            tube_part = TubePart("Base")
-            tube_part.move(x, y - i)
-        tube_part = TubePart("Head")
-        tube_part.move(x, y - pow + 1)
+            TubePart("Base", x, y - i)
+        TubePart("Head", x, y - pow + 1)
+
+    @staticmethod
+    def cells(x, y, pow):
+        """Все блоки, которые занимает труба"""
+        return [(x + dx, y - i) for i in range(pow) for dx in range(Tube.WIDTH)]
@@ -1,7 +1,13 @@
 import pygame
 import os
 import sys
-from collections import OrderedDict
+import io
+import mmap
+import struct
+import hashlib
+import random
+import weakref
+from collections import OrderedDict, defaultdict
 
 
 def terminate():
@@ -11,20 +17,71 @@ def terminate():
 
 def load_image(name, colorkey=None):
     """Функция безопасной загрузки и преобразования изображения. Конвертирует альфа-канал,
-    может преобразовать цвет в альфа-канал, растягивает исходняе изображение в 3 раза"""
+    может преобразовать цвет в альфа-канал, растягивает исходняе изображение в SCALE раз.
+    Растянутые изображения сохраняются в дисковый кэш и при следующих запусках не декодируются
+    и не растягиваются заново"""
     fullname = os.path.join('data', 'images', name)
     try:
-        image = pygame.image.load(fullname)
-    except pygame.error as message:
+        with open(fullname, 'rb') as file:
+            source = file.read()
+        cachename = os.path.join(CACHE_DIR, '%s.%s.x%d.rgba' % (
+            name, hashlib.sha1(source).hexdigest()[:16], SCALE))
+        image = load_cached_image(cachename)
+        if image is None:
+            image = pygame.image.load(io.BytesIO(source), name).convert_alpha()
+            image_rect = image.get_rect()
+            image = pygame.transform.scale(image, (image_rect.w * SCALE, image_rect.h * SCALE))
+            save_cached_image(cachename, image)
+    except (OSError, pygame.error) as message:
         print('Cannot load image:', name)
         raise SystemExit(message)
-    image = image.convert_alpha()
     if colorkey is not None:
-        if colorkey is -1:
+        if colorkey == -1:
             colorkey = image.get_at((0, 0))
         image.set_colorkey(colorkey)
-    image_rect = image.get_rect()
-    return pygame.transform.scale(image, (image_rect.w * 3, image_rect.h * 3))
+    return image
+
+
+def load_cached_image(cachename):
+    """Загрузка изображения из дискового кэша. Файл кэша - это заголовок с размерами и сырые
+    RGBA-пиксели, поэтому он отображается в память и сразу передается в pygame.image.frombuffer.
+    Возвращает None, если в кэше изображения нет"""
+    try:
+        with open(cachename, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                size = struct.unpack_from(CACHE_HEADER, data)
+                with memoryview(data)[struct.calcsize(CACHE_HEADER):] as pixels:
+                    # convert_alpha копирует пиксели, после этого файл можно закрыть
+                    return pygame.image.frombuffer(pixels, size, 'RGBA').convert_alpha()
+    except (OSError, ValueError, struct.error, pygame.error):
+        return None
+
+
+def save_cached_image(cachename, image):
+    """Сохранение изображения в дисковый кэш. Ошибки записи не мешают игре, поэтому
+    игнорируются"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cachename + '.tmp', 'wb') as file:
+            file.write(struct.pack(CACHE_HEADER, *image.get_size()))
+            file.write(pygame.image.tobytes(image, 'RGBA'))
+        os.replace(cachename + '.tmp', cachename)  # Чтобы не оставить недописанный файл
+    except OSError:
+        pass
+
+
+def get_asset(key, factory):
+    """Кэш загруженных, растянутых, разрезанных и отраженных изображений на все время работы
+    процесса. При первом запросе ключа key ассет создается функцией factory, дальше берется из
+    кэша, поэтому перезагрузка уровня не читает и не преобразует картинки заново"""
+    if key not in assets:
+        assets[key] = factory()
+    return assets[key]
+
+
+def flip_frames(frames):
+    """Зеркальные по горизонтали копии кадров"""
+    return [pygame.transform.flip(frame, True, False) for frame in frames]
 
 
 def load_font(name, size):
@@ -38,6 +95,61 @@ def load_font(name, size):
     return font
 
 
+class GlyphAtlas:
+    """Символы шрифта, заранее отрисованные на одной поверхности. Строки собираются из кусков
+    атласа blit'ами, без отрисовки шрифтом. Символы не из CHARS отрисовываются при первой встрече
+    и тоже запоминаются"""
+    CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-: '
+
+    def __init__(self, font, color='White'):
+        self.font = font
+        self.color = pygame.Color(color)
+        rendered = [font.render(char, 1, self.color) for char in GlyphAtlas.CHARS]
+        self.surface = pygame.Surface((sum(glyph.get_width() for glyph in rendered),
+                                       max(glyph.get_height() for glyph in rendered)),
+                                      pygame.SRCALPHA)
+        self.glyphs = {}  # Символ -> (поверхность, область символа на ней, сдвиг до следующего)
+        x = 0
+        for char, glyph in zip(GlyphAtlas.CHARS, rendered):
+            # На прозрачную поверхность символ копируется, а не смешивается с черным фоном
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.glyphs[char] = (self.surface, glyph.get_rect(x=x), self.advance(char, glyph))
+            x += glyph.get_width()
+
+    def advance(self, char, glyph):
+        """Сдвиг до следующего символа. Он бывает меньше ширины картинки символа"""
+        metrics = self.font.metrics(char)[0]
+        return metrics[4] if metrics else glyph.get_width()
+
+    def glyph(self, char):
+        if char not in self.glyphs:
+            glyph = self.font.render(char, 1, self.color)
+            self.glyphs[char] = (glyph, glyph.get_rect(), self.advance(char, glyph))
+        return self.glyphs[char]
+
+    def size(self, text):
+        x = width = height = 0
+        for char in text:
+            source, area, advance = self.glyph(char)
+            width, height = max(width, x + area.w), max(height, area.h)
+            x += advance
+        return width, height
+
+    def blit(self, surface, text, pos, special_flags=0):
+        """Вывод строки text на surface, pos - левый верхний угол"""
+        x, y = pos
+        for char in text:
+            source, area, advance = self.glyph(char)
+            surface.blit(source, (x, y), area, special_flags)
+            x += advance
+
+    def render(self, text):
+        """Аналог Font.render: новая поверхность со строкой text"""
+        surface = pygame.Surface(self.size(text), pygame.SRCALPHA)
+        self.blit(surface, text, (0, 0), pygame.BLEND_RGBA_MAX)  # См. __init__
+        return surface
+
+
 def cut_sheet(sheet, columns, rows):
     """Функция, разрезающая переданный surface на заданное количество частей.
     Всегда возвращает  двумерный список surface'ов"""
@@ -52,18 +164,150 @@ def cut_sheet(sheet, columns, rows):
     return frames
 
 
+def cut_row(name, columns, rows, row):
+    """Функция, вырезающая из листа name строку row и разрезающая ее на columns кадров. Строка
+    копируется, поэтому сам лист после этого в памяти не остается"""
+    sheet = load_image(name)
+    height = sheet.get_height() // rows
+    line = sheet.subsurface(pygame.Rect(0, height * row, sheet.get_width(), height)).copy()
+    return cut_sheet(line, columns, 1)[0]
+
+
+def rect_collideany(rect, group):
+    """Аналог pygame.sprite.spritecollideany для голого rect: первый спрайт группы,
+    пересекающийся с rect, или None"""
+    for sprite in group:
+        if rect.colliderect(sprite.rect):
+            return sprite
+
+
+def rect_collide(rect, group):
+    """Аналог pygame.sprite.spritecollide для голого rect: все спрайты группы,
+    пересекающиеся с rect"""
+    return [sprite for sprite in group if rect.colliderect(sprite.rect)]
+
+
+class Palette:
+    """Таблица кадров по мирам (или другим именам строк листа). Кадры мира создаются функцией
+    build при первом запросе и хранятся в кэше ассетов, пока их не освободит release_unused"""
+    instances = []  # Все палитры, зависящие от мира
+
+    def __init__(self, key, build, per_world=True):
+        self.key = key  # Уникальное имя палитры в кэше ассетов
+        self.build = build
+        if per_world:
+            Palette.instances.append(self)
+
+    @classmethod
+    def sheet(cls, name, columns, rows):
+        """Палитра листа, в котором каждому миру из WORLDS соответствует одна строка"""
+        return cls(name, lambda world: cut_row(name, columns, rows, WORLDS.index(world)))
+
+    def __getitem__(self, world):
+        return get_asset((self.key, world), lambda: self.build(world))
+
+    def derived(self, world, key, factory):
+        """Ассет, построенный из кадров мира world, например повернутые кадры. Хранится под
+        ключом (ключ палитры, world, *key) и освобождается вместе с кадрами мира"""
+        return get_asset((self.key, world) + key, factory)
+
+    @staticmethod
+    def release_unused(worlds):
+        """Освобождение кадров всех миров, кроме используемых загруженными уровнями, и
+        построенных из них ассетов"""
+        keys = {palette.key for palette in Palette.instances}
+        for key in [key for key in assets if type(key) is tuple and len(key) >= 2 and
+                    key[0] in keys and key[1] in WORLDS and key[1] not in worlds]:
+            del assets[key]
+        Animation.tracks.clear()  # Дорожки держат кадры, поэтому их тоже нужно отпустить
+
+
+class AnimationClock:
+    """Общие часы всех анимаций. Продвигаются один раз за кадр в Main.update, поэтому
+    спрайтам не нужно хранить и обновлять собственные счетчики кадров"""
+
+    def __init__(self):
+        self.ticks = 0  # Кадров с начала игры
+
+    def tick(self):
+        self.ticks += 1
+
+
+class Animation:
+    """Дорожка зацикленной анимации: кадры frames сменяются каждые period тиков часов clock.
+    Дорожки хранятся по таблице кадров, поэтому, например, все блоки Quest одного мира
+    используют одну дорожку и мерцают синхронно"""
+    tracks = {}
+
+    def __init__(self, frames, period):
+        self.frames = frames
+        self.period = period
+
+    @classmethod
+    def track(cls, frames, period):
+        key = (tuple(frames), period)
+        if key not in cls.tracks:
+            cls.tracks[key] = cls(key[0], period)
+        return cls.tracks[key]
+
+    def sample(self):
+        """Кадр для текущего тика часов"""
+        return self.frames[clock.ticks // self.period % len(self.frames)]
+
+
+class Animated:
+    """Примесь для анимированных спрайтов. Пока задана дорожка animation, image выбирается из
+    нее только при чтении, то есть при отрисовке. Присваивание image останавливает анимацию на
+    этой картинке, так что для разовых кадров (смерть, взрыв) ничего менять не нужно"""
+    animation = None
+
+    @property
+    def image(self):
+        if self.animation is not None:
+            return self.animation.sample()
+        return self.still
+
+    @image.setter
+    def image(self, image):
+        self.animation = None
+        self.still = image
+
+
+class Pooled:
+    """Примесь для короткоживущих эффектов. Убитый объект складывается в пул своего класса, а
+    конструктор берет объект из пула, если тот не пуст, и __init__ заново настраивает его.
+    Поэтому __init__ такого класса должен задавать все состояние объекта"""
+    POOL_SIZE = 32  # Сколько убитых объектов класса хранится для повторного использования
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.pool = []
+
+    def __new__(cls, *args, **kwargs):
+        if cls.pool:
+            return cls.pool.pop()
+        return super().__new__(cls)
+
+    def kill(self):
+        alive = self.alive()  # Повторный kill не должен класть объект в пул второй раз
+        super().kill()
+        if alive and len(self.pool) < self.POOL_SIZE:
+            self.pool.append(self)
+
+
 class Hud:
     """Heads-Up Display. Хранит счет, всемя в секундах, название мира, количество монет и жизней.
     Занимается подсчетом времени. Передает в main сообщение об окончании времени или жизней.
     Превращается в заставку gameover"""
     pygame.font.init()
     FONT = load_font("SuperMario256.ttf", 40)
+    GLYPHS = GlyphAtlas(FONT)
 
     def __init__(self):
         self.info = OrderedDict([("SCORE", 0), ("TIME", 400), ("WORLD", "1-1"), ("COINS", 0),
                                  ("LIVES", 3)])
-        self.first_line = [(key, Hud.FONT.render(key, 1, pygame.Color('White'))) for key in
-                           self.info.keys()]
+        self.first_line = [(key, Hud.GLYPHS.render(key)) for key in self.info.keys()]
+        self.values = {}  # Ключ -> (значение, его картинка). Картинка обновляется при изменении
         self.first_line_width = sum([item[1].get_width() for item in self.first_line])
         self.h_indent = (WIDTH - self.first_line_width) // (len(self.first_line) + 1)
         self.v_indent = 10  # Отступ от верхней границы и между строками худа
@@ -104,11 +348,17 @@ class Hud:
         x = self.h_indent
         for key, key_surf in self.first_line:
             screen.blit(key_surf, (x, self.v_indent))
-            val_surf = Hud.FONT.render(str(self.info[key]), 1, pygame.Color('White'))
+            val_surf = self.value_surf(key)
             screen.blit(val_surf, (x + (key_surf.get_width() - val_surf.get_width()) // 2,
                                    self.v_indent + key_surf.get_height()))
             x += self.h_indent + key_surf.get_width()
 
+    def value_surf(self, key):
+        """Картинка значения key. Собирается из атласа только если значение изменилось"""
+        if key not in self.values or self.values[key][0] != self.info[key]:
+            self.values[key] = self.info[key], Hud.GLYPHS.render(str(self.info[key]))
+        return self.values[key][1]
+
     def start_count(self):
         self.count = True
 
@@ -153,13 +403,16 @@ class Hud:
     def game_over_draw(self, screen):
         """Создание и отрисовка заставки game over"""
         screen.fill((0, 0, 0))
-        text = Hud.FONT.render('GAME OVER', 1, pygame.Color('White'))
-        screen.blit(text, (WIDTH // 2 - text.get_width() // 2,
-                           HEIGHT // 2 - text.get_height() // 2))
+        width, height = Hud.GLYPHS.size('GAME OVER')
+        Hud.GLYPHS.blit(screen, 'GAME OVER', (WIDTH // 2 - width // 2, HEIGHT // 2 - height // 2))
 
     def get_game_over(self):
         return self.game_over
 
+    def get_height(self):
+        """Высота, которую занимают две строки худа вместе с отступами"""
+        return self.v_indent * 3 + Hud.FONT.get_linesize() * 2
+
     def get_load_level_request(self):
         return self.load_level_request
 
@@ -168,45 +421,324 @@ class Hud:
 
 
 class Camera:
-    # зададим начальный сдвиг камеры
+    """Камера хранит левую границу экрана в мировых координатах. Спрайты никогда не сдвигаются,
+    смещение камеры применяется только при отрисовке видимых спрайтов"""
+
     def __init__(self):
+        self.x = 0  # Левая граница экрана в мировых координатах
+        self.dx = 0  # Сдвиг камеры за последний кадр
+
+    def reset(self):
+        self.x = 0
         self.dx = 0
 
-    # сдвинуть объект obj на смещение камеры
-    def apply(self, obj):
-        obj.rect.x += self.dx
-        if obj.rect.right < 0 or obj.rect.y > HEIGHT:
-            obj.kill()
+    def to_screen(self, rect):
+        """Перевод rect из мировых координат в экранные"""
+        return rect.move(-self.x, 0)
+
+    def is_visible(self, rect):
+        return rect.right > self.x and rect.x < self.x + WIDTH
+
+    def in_view(self, rect):
+        """Находится ли левая граница rect в пределах экрана по x"""
+        return 0 <= rect.x - self.x <= WIDTH
+
+    def is_behind(self, rect):
+        """Объект ушел за левую границу экрана или упал за нижнюю"""
+        return rect.right < self.x or rect.y > HEIGHT
+
+    def cull(self, group):
+        """Удаление спрайтов группы, оказавшихся за пределами уровня"""
+        for sprite in group.sprites():
+            if self.is_behind(sprite.rect):
+                sprite.kill()
+
+    def draw(self, group, surface):
+        """Отрисовка видимых спрайтов группы со смещением камеры"""
+        for sprite in group:
+            if self.is_visible(sprite.rect):
+                surface.blit(sprite.image, (sprite.rect.x - self.x, sprite.rect.y))
 
     # позиционировать камеру на объекте target
     def update(self, target):
-        self.dx = min(0, -(target.rect.x + target.rect.w // 2 - WIDTH // 2))
-        target.rect.x += self.dx
-        if target.rect.x <= 0:
-            target.rect.x = 0
+        self.dx = min(0, -(target.rect.x - self.x + target.rect.w // 2 - WIDTH // 2))
+        self.x -= self.dx
+        if target.rect.x <= self.x:
+            target.rect.x = self.x
             target.vx = max(0, target.vx)
 
 
+class TilesGroup(pygame.sprite.Group):
+    """Группа тайлов с индексом по равномерной сетке с шагом PPM. Тайлы лежат на сетке, поэтому
+    поиск пересечения с rect сводится к просмотру нескольких ячеек, а не всей группы.
+    Спрайт должен иметь rect к моменту добавления в группу"""
+
+    def __init__(self, *sprites):
+        self.cells = defaultdict(list)  # (столбец, строка) -> тайлы в этой ячейке
+        self.sprite_cells = {}  # тайл -> ячейки, в которых он зарегистрирован
+        # (статичный ли тайл, номер добавления), чтобы результат совпадал с spritecollideany
+        self.order = {}
+        self.counter = 0
+        super().__init__(*sprites)
+
+    @staticmethod
+    def cells_of(rect):
+        """Все ячейки сетки, которые пересекает rect"""
+        return [(col, row) for col in range(rect.x // PPM, (rect.right - 1) // PPM + 1)
+                for row in range(rect.y // PPM, (rect.bottom - 1) // PPM + 1)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = 1, self.counter
+        self.counter += 1
+        self.index(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.unindex(sprite)
+        del self.order[sprite]
+
+    def index(self, sprite):
+        cells = self.cells_of(sprite.rect)
+        self.sprite_cells[sprite] = cells
+        for cell in cells:
+            self.cells[cell].append(sprite)
+
+    def unindex(self, sprite):
+        for cell in self.sprite_cells.pop(sprite):
+            self.cells[cell].remove(sprite)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def reindex(self, sprite):
+        """Должен вызываться после перемещения тайла"""
+        if sprite in self.sprite_cells:
+            self.unindex(sprite)
+            self.index(sprite)
+
+    def collide(self, rect):
+        """Первый по порядку добавления тайл, пересекающийся с rect, или None"""
+        found = None
+        for cell in self.cells_of(rect):
+            for tile in self.cells.get(cell, ()):
+                if tile.rect.colliderect(rect) and (
+                        found is None or self.order[tile] < self.order[found]):
+                    found = tile
+        return found
+
+    def nearest(self, rect, key):
+        """Тайл, пересекающийся с rect, с наименьшим key(tile), или None. Из равных выбирается
+        первый по порядку добавления"""
+        found = None
+        for cell in self.cells_of(rect):
+            for tile in self.cells.get(cell, ()):
+                if tile.rect.colliderect(rect) and (found is None or (
+                        key(tile), self.order[tile]) < (key(found), self.order[found])):
+                    found = tile
+        return found
+
+    def collideany(self, sprite):
+        """Аналог pygame.sprite.spritecollideany(sprite, tiles_group)"""
+        return self.collide(sprite.rect)
+
+    def add_static(self, sprite):
+        """Статичные тайлы участвуют только в поиске коллизий: их не нужно ни обновлять,
+        ни рисовать по отдельности, поэтому в саму группу они не попадают. В поиске они идут
+        раньше обычных, даже если добавлены позже, как при создании всех их при загрузке"""
+        self.order[sprite] = 0, self.counter
+        self.counter += 1
+        self.index(sprite)
+
+    def remove_static(self, sprite):
+        self.unindex(sprite)
+        del self.order[sprite]
+
+    def empty(self):
+        super().empty()
+        self.cells.clear()
+        self.sprite_cells.clear()
+        self.order.clear()
+
+
+class EnemiesGroup(pygame.sprite.Group):
+    """Группа врагов с широкой фазой поиска столкновений. Раз в кадр, перед обновлением
+    спрайтов, build_pairs сортирует врагов по x и одним проходом находит пары, чьи отрезки по x
+    с запасом пересекаются. Во время обновления враг проверяет столкновения только со своими
+    кандидатами, а не со всей группой"""
+
+    def __init__(self, *sprites):
+        self.pairs = {}  # Враг -> кандидаты в порядке группы
+        self.late = []  # Враги, добавленные после build_pairs
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.late.append(sprite)
+
+    def build_pairs(self):
+        sprites = self.sprites()
+        order = {sprite: i for i, sprite in enumerate(sprites)}
+        self.pairs = {sprite: [] for sprite in sprites}
+        self.late = []
+        # Запас по x. Должен покрывать взаимное смещение двух врагов за кадр вместе с коллизиями,
+        # которые выступают за rect на пиксель: самая быстрая пара - два панциря по 10 пикселей
+        margin = PPM // 2
+        active = []  # Враги, чьи отрезки еще могут пересечься с отрезками следующих
+        for sprite in sorted(sprites, key=lambda sprite: sprite.rect.x):
+            left = sprite.rect.x - 2 * margin
+            active = [other for other in active if other.rect.right >= left]
+            for other in active:
+                self.pairs[sprite].append(other)
+                self.pairs[other].append(sprite)
+            active.append(sprite)
+        for partners in self.pairs.values():
+            partners.sort(key=order.get)
+
+    def candidates(self, sprite):
+        """Живые враги, с которыми sprite может столкнуться в этом кадре, в порядке группы.
+        Враг, появившийся после build_pairs, проверяется со всеми"""
+        if sprite not in self.pairs:
+            return [other for other in self if other is not sprite]
+        return [other for other in self.pairs[sprite] + self.late
+                if other is not sprite and other in self.spritedict]
+
+    def empty(self):
+        super().empty()
+        self.pairs = {}
+        self.late = []
+
+
+class StaticLayer(pygame.sprite.Group):
+    """Слой неизменяемых спрайтов, запеченных в поверхности-чанки шириной в экран. Чанки сами
+    являются спрайтами в мировых координатах, поэтому слой рисуется камерой как обычная группа,
+    а на экран попадают только один-два чанка под камерой"""
+    # Цвет прозрачности чанков. У картинок игры альфа бывает только 0 или 255, поэтому колоркей
+    # передает их без потерь и позволяет использовать быстрый RLE-блит
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = {}  # Номер чанка -> спрайт чанка
+        self.spare = []  # Поверхности чанков прошлого уровня. Создавать новые дороже, чем залить
+
+    def get_chunk(self, index):
+        """Возвращает чанк с данным номером, создавая его при необходимости"""
+        if index not in self.chunks:
+            chunk = pygame.sprite.Sprite(self)
+            if self.spare:
+                chunk.image = self.spare.pop()
+                # Уже нарисованная поверхность сжата RLE, а рисовать в сжатую очень медленно
+                chunk.image.set_colorkey(None)
+            else:
+                chunk.image = pygame.Surface((WIDTH, HEIGHT)).convert()
+            chunk.image.fill(StaticLayer.COLORKEY)
+            chunk.image.set_colorkey(StaticLayer.COLORKEY, pygame.RLEACCEL)
+            chunk.rect = chunk.image.get_rect(x=index * WIDTH)
+            self.chunks[index] = chunk
+        return self.chunks[index]
+
+    def bake(self, sprite):
+        """Рисует спрайт на всех чанках, которые он пересекает. Сам спрайт после этого можно
+        не хранить в группах отрисовки"""
+        for index in range(sprite.rect.x // WIDTH, (sprite.rect.right - 1) // WIDTH + 1):
+            chunk = self.get_chunk(index)
+            chunk.image.blit(sprite.image, sprite.rect.move(-chunk.rect.x, 0))
+
+    def release(self, index):
+        """Убирает чанк, который больше не понадобится. Его поверхность пойдет на новые чанки"""
+        chunk = self.chunks.pop(index, None)
+        if chunk:
+            chunk.kill()
+            self.spare.append(chunk.image)
+
+    def empty(self):
+        super().empty()
+        self.spare.extend(chunk.image for chunk in self.chunks.values())
+        self.chunks.clear()
+
+
+class Debug:
+    """Отладочная отрисовка поверх игры: прямоугольники спрайтов, коллизии персонажей, занятые
+    ячейки сетки тайлов и номера персонажей. Включается переменной окружения MARIVO_DEBUG=1 или
+    клавишей F1. Рисуется только в фазе отрисовки и только когда включена, поэтому в обычной игре
+    ничего не стоит"""
+    BOX_COLOR = (255, 255, 0)
+    SIDE_COLOR = (0, 255, 0)
+    CELL_COLOR = (255, 0, 0)
+
+    def __init__(self):
+        self.enabled = os.environ.get('MARIVO_DEBUG') == '1'
+        self.font = None
+        self.ids = weakref.WeakKeyDictionary()  # Персонаж -> его номер
+        self.next_id = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def get_id(self, sprite):
+        """Номер персонажа, выдается при первом появлении на экране отладки"""
+        if sprite not in self.ids:
+            self.ids[sprite] = self.next_id
+            self.next_id += 1
+        return self.ids[sprite]
+
+    def draw(self, surface):
+        if not self.enabled:
+            return
+        if self.font is None:
+            self.font = load_font("SuperMario256.ttf", 14)
+
+        # Занятые ячейки сетки тайлов под камерой
+        for col, row in tiles_group.cells:
+            cell = pygame.Rect(col * PPM, row * PPM, PPM, PPM)
+            if camera.is_visible(cell):
+                pygame.draw.rect(surface, Debug.CELL_COLOR, camera.to_screen(cell), 1)
+
+        for group in [players_group, all_sprites]:
+            for sprite in group:
+                if not camera.is_visible(sprite.rect):
+                    continue
+                pygame.draw.rect(surface, Debug.BOX_COLOR, camera.to_screen(sprite.rect), 1)
+                if hasattr(sprite, 'get_sides'):  # Коллизии и номер есть только у персонажей
+                    for side in sprite.get_sides():
+                        pygame.draw.rect(surface, Debug.SIDE_COLOR, camera.to_screen(side))
+                    label = self.font.render('%s %d' % (type(sprite).__name__,
+                                                        self.get_id(sprite)),
+                                             1, pygame.Color('White'))
+                    surface.blit(label, camera.to_screen(sprite.rect).move(0, -label.get_height()))
+
+
 pygame.init()
+SCALE = 3  # Во сколько раз растягиваются исходные изображения
+CACHE_DIR = os.path.join('data', 'cache')  # Дисковый кэш растянутых изображений
+CACHE_HEADER = '<II'  # Заголовок файла кэша: ширина и высота изображения
 PPM = 48
 FPS = 60
 SIZE = WIDTH, HEIGHT = 32 * PPM, 15 * PPM
 GRAVITY = 1
 screen = pygame.display.set_mode(SIZE)
 scores = []
+assets = {}  # Ключ -> ассет, см. get_asset
+WORLDS = ['normal', 'underground', 'castle', 'underwater']  # Порядок строк в листах тайлов
+rng = random.Random()  # Все случайности игры берутся отсюда, чтобы записи ввода воспроизводились
 
 camera = Camera()
+clock = AnimationClock()
 hud = Hud()
 
 all_sprites = pygame.sprite.Group()
-decor_group = pygame.sprite.Group()
+decor_layer = StaticLayer()
 players_group = pygame.sprite.Group()
-enemies_group = pygame.sprite.Group()
-tiles_group = pygame.sprite.Group()
+enemies_group = EnemiesGroup()
+tiles_group = TilesGroup()
+tiles_layer = StaticLayer()
 castle_group = pygame.sprite.Group()
+debug = Debug()
 items_group = pygame.sprite.Group()
 particles_group = pygame.sprite.Group()
 
 # Группы в правильном для отрисовки порядке
-groups = [decor_group, items_group, enemies_group, castle_group, tiles_group, players_group,
-          particles_group]
+groups = [decor_layer, items_group, enemies_group, castle_group, tiles_layer, tiles_group,
+          players_group, particles_group]
+# Группы подвижных объектов, которые удаляются камерой при выходе за пределы уровня
+culled_groups = [enemies_group, items_group, particles_group]
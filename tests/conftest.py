@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# Драйвер нужно выбрать до того, как Utilities инициализирует pygame и создаст окно
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # Изображения и уровни загружаются по путям относительно корня игры
+
+import Utilities
+
+
+@pytest.fixture
+def world():
+    """Пустой мир для теста. Все созданные тестом спрайты удаляются после него"""
+    yield Utilities
+    Utilities.camera.reset()
+    for group in Utilities.groups + [Utilities.all_sprites]:
+        group.empty()
@@ -0,0 +1,24 @@
+import pytest
+import pygame
+from Utilities import PPM
+import Map  # Модули персонажей импортируют друг друга, первым их загружает Map
+from Tile import SolidSpan
+from Goomba import Goomba
+from Koopa import Koopa, JumpingKoopa
+
+ENEMIES = [Goomba, Koopa, JumpingKoopa]
+
+
+@pytest.mark.parametrize('on_screen', [False, True])
+@pytest.mark.parametrize('enemy_class', ENEMIES)
+def test_enemy_over_merged_floor(world, enemy_class, on_screen):
+    """Враги уровня стоят в строке 12 над полом из одного SolidSpan. Высокие враги при этом
+    погружены в пол, и коллизия должна поставить их на пол, а не перенести к краю SolidSpan.
+    Враг на экране за кадр сдвигается не больше, чем на свою скорость"""
+    SolidSpan(pygame.Rect(0, 13 * PPM, 20 * PPM, 2 * PPM))
+    enemy = enemy_class(8, 12, 'normal')
+    enemy.on_screen = on_screen
+    x = enemy.rect.x
+    enemy.update()
+    assert abs(enemy.rect.x - x) <= (abs(enemy.vx) if on_screen else 0)
+    assert enemy.rect.bottom == 13 * PPM
@@ -0,0 +1,54 @@
+import json
+import pytest
+import LevelCompiler
+import Map
+from LevelCompiler import LevelError
+from LevelPack import LevelPack, validate
+
+with open('data/levels/level1.json', encoding='utf8') as file:
+    LEVEL = json.load(file)
+
+
+@pytest.mark.parametrize('change', [{'world': 'space'}, {'size': [0, 15]},
+                                    {'bricks': [1, 2, 3]}, {'tubes': {'12': [[1]]}},
+                                    {'BonusBrick': [[1, 2, 'Nope']]}])
+def test_validate_rejects_broken_levels(change):
+    validate(LEVEL)
+    with pytest.raises(LevelError):
+        validate(dict(LEVEL, **change))
+
+
+def test_load_compiled_rejects_damaged_file(tmp_path):
+    path = str(tmp_path / 'level.lvl')
+    LevelCompiler.compile_level('data/levels/level1.json', path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:20])
+    with pytest.raises(LevelError):
+        LevelCompiler.load_compiled(path)
+
+
+def test_pack_skips_broken_levels(tmp_path):
+    for name, level in [('level1', LEVEL), ('level2', dict(LEVEL, bricks=[1])),
+                        ('level10', LEVEL)]:
+        (tmp_path / (name + '.json')).write_text(json.dumps(level), encoding='utf8')
+    (tmp_path / 'level3.json').write_text('{', encoding='utf8')
+    pack = LevelPack(str(tmp_path), str(tmp_path / 'manifest.json'))
+    assert [level.name for level in pack] == ['level1', 'level10']
+
+
+def test_map_caches_only_current_level(world, monkeypatch):
+    """Перезапуск уровня не читает файл, пока тот не изменился. Старые уровни не хранятся"""
+    loads = []
+    load = Map.load
+    monkeypatch.setattr(Map, 'load', lambda name: loads.append(name) or load(name))
+    monkeypatch.setattr(Map, 'levels', {})
+    Map.load_level('level1', world)
+    Map.load_level('level1', world)
+    assert loads == ['level1']
+    monkeypatch.setattr(Map, 'stamp', lambda name: (0, 0))  # Файл уровня изменился
+    Map.load_level('level1', world)
+    assert loads == ['level1', 'level1']
+    Map.load_level('level2', world)
+    assert list(Map.levels) == ['level2']
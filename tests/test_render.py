@@ -0,0 +1,25 @@
+import pygame
+from Utilities import PPM, SIZE, camera
+import Map  # Модули персонажей импортируют друг друга, первым их загружает Map
+from FlagPole import FlagPole
+from Render import FullRenderer, DirtyRenderer
+
+
+def frames_match(full, dirty):
+    """Рисует кадр обоими способами и сравнивает результат"""
+    full_screen, dirty_screen = pygame.Surface(SIZE), pygame.Surface(SIZE)
+    full.draw(full_screen)
+    dirty.draw(dirty_screen)
+    return pygame.image.tobytes(full_screen, 'RGB') == pygame.image.tobytes(dirty_screen, 'RGB')
+
+
+def test_dirty_renderer_keeps_group_order(world):
+    """Флажок выступает левее флагштока и появляется на экране раньше него, хотя в группе идет
+    после. DirtyRenderer должен рисовать его поверх флагштока, как и FullRenderer"""
+    full, dirty = FullRenderer(), DirtyRenderer()
+    FlagPole(33, 12)  # Виден только флажок
+    assert frames_match(full, dirty)
+    for step in range(PPM // 4):  # Камера доезжает до флагштока
+        camera.x += 4
+        camera.dx = -4
+        assert frames_match(full, dirty)